@@ -0,0 +1,91 @@
+"""Compare the IVF face index against exact search on synthetic galleries.
+
+Run from the repository root:
+
+    python -m benchmarks.ann_benchmark --sizes 10000 100000 500000
+"""
+import argparse
+
+import numpy as np
+
+from web_app.faceDetection.gallery import FaceGallery
+from web_app.faceDetection.matcher import FaceMatcher
+from web_app.faceDetection.ann import IVFIndex
+from benchmarks.common import timed, write_results
+
+
+def synthetic_gallery(identities, dim, rng):
+    embeddings = rng.standard_normal((identities, dim)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return FaceGallery(embeddings, np.arange(identities), np.arange(identities))
+
+
+def noisy_queries(gallery, count, noise, rng):
+    rows = rng.choice(len(gallery), count, replace=False)
+    queries = gallery.embeddings[rows] + noise * rng.standard_normal(
+        (count, gallery.dim)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return queries
+
+
+def run(size, dim, queries_per_run, nprobes, noise, seed):
+    rng = np.random.default_rng(seed)
+    gallery = synthetic_gallery(size, dim, rng)
+    queries = noisy_queries(gallery, queries_per_run, noise, rng)
+
+    exact = FaceMatcher(gallery, threshold=-1.0, top_k=1)
+    exact_matches, exact_seconds = timed(exact.match, queries)
+    truth = [m[0].user_id for m in exact_matches]
+
+    index, build_seconds = timed(
+        lambda: IVFIndex.from_gallery(gallery, threshold=-1.0, top_k=1))
+    result = {
+        'identities': size,
+        'dim': dim,
+        'queries': queries_per_run,
+        'exact_ms_per_query': 1000 * exact_seconds / queries_per_run,
+        'ivf_nlist': index.nlist,
+        'ivf_build_s': build_seconds,
+        'ivf': [],
+    }
+    for nprobe in nprobes:
+        index.nprobe = nprobe
+        matches, seconds = timed(index.match, queries)
+        found = [m[0].user_id if m else None for m in matches]
+        result['ivf'].append({
+            'nprobe': nprobe,
+            'ms_per_query': 1000 * seconds / queries_per_run,
+            'recall_at_1': float(np.mean([a == b for a, b in zip(found, truth)])),
+        })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[10000, 100000, 500000])
+    parser.add_argument('--dim', type=int, default=128)
+    parser.add_argument('--queries', type=int, default=300)
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 4, 8, 16, 32])
+    parser.add_argument('--noise', type=float, default=0.05)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write results to this JSON file')
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        result = run(size, args.dim, args.queries, args.nprobe, args.noise,
+                     args.seed)
+        results.append(result)
+        print(f"{size} identities: exact {result['exact_ms_per_query']:.3f} ms/query, "
+              f"IVF nlist={result['ivf_nlist']} built in {result['ivf_build_s']:.1f}s")
+        for row in result['ivf']:
+            print(f"  nprobe={row['nprobe']:>3}  {row['ms_per_query']:.3f} ms/query  "
+                  f"recall@1={row['recall_at_1']:.3f}")
+
+    if args.output:
+        write_results(args.output, 'ann_benchmark', vars(args), results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+
+
+def percentiles(samples):
+    if not samples:
+        return {'count': 0}
+    ms = 1000 * np.asarray(samples)
+    return {
+        'count': len(samples),
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p95_ms': float(np.percentile(ms, 95)),
+        'max_ms': float(ms.max()),
+    }
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def repeat(fn, runs, warmup=1):
+    """Call fn warmup + runs times; return the timings of the measured runs."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def use_scratch_database(url, filename, cache='none'):
+    """Point the app at ``url``, or at a temporary SQLite file when None,
+    with the given CACHE_BACKEND.
+
+    Must run before web_app is imported. An exported DATABASE_URL is always
+    overridden, so a benchmark never seeds or wipes the app's own database
+    by accident, and a shared cache lives in the scratch directory so it
+    never serves another run's pages. Returns the scratch directory, for
+    the caller to clean up.
+    """
+    scratch = tempfile.TemporaryDirectory()
+    os.environ['DATABASE_URL'] = url or 'sqlite:///' + os.path.join(scratch.name, filename)
+    os.environ['CACHE_BACKEND'] = cache
+    os.environ['CACHE_PATH'] = os.path.join(scratch.name, 'cache.db')
+    return scratch
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                              capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(path, benchmark, params, results):
+    """Write results with enough context to compare runs across commits."""
+    if params.get('database_url'):
+        # Keep server credentials out of result files that get shared
+        from sqlalchemy.engine import make_url
+        params = dict(params, database_url=make_url(params['database_url'])
+                      .render_as_string(hide_password=True))
+    with open(path, 'w') as f:
+        json.dump({
+            'benchmark': benchmark,
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'params': params,
+            'results': results,
+        }, f, indent=2)
@@ -0,0 +1,174 @@
+"""Load-test concurrent attendance write-backs against report reads.
+
+Writer threads each play a classroom session that closes every few hundred
+milliseconds and writes its roster's attendance; reader threads hit the
+course report and student dashboard through the Flask test client at the
+same time. Latencies and errors are reported per role.
+
+Run from the repository root against a scratch database (the default is a
+temporary SQLite file; pass --database-url to test a server database, and
+set SQLITE_WAL=0 to compare against SQLite's rollback journal). DATABASE_URL
+is ignored, so the app's own database is never seeded by accident:
+
+    python -m benchmarks.db_load_test --courses 8 --students 200 --seconds 20
+"""
+import argparse
+import random
+import threading
+import time
+from datetime import date, timedelta
+
+from benchmarks.common import percentiles, use_scratch_database, write_results
+
+
+def seed(courses, students_per_course):
+    from web_app.extensions import db
+    from web_app.models import Course, User
+
+    professor = User(name='Load Professor', email='load-professor@example.com',
+                     password='x', role='professor')
+    db.session.add(professor)
+    db.session.flush()
+
+    course_ids, student_ids = [], []
+    for c in range(courses):
+        course = Course(name=f'Load Course {c}', professor_id=professor.id)
+        students = [User(name=f'Student {c}-{s}',
+                         email=f'student-{c}-{s}@example.com', password='x',
+                         role='student',
+                         enrollment_number=f'{c:04d}{s:06d}')
+                    for s in range(students_per_course)]
+        db.session.add(course)
+        db.session.add_all(students)
+        db.session.flush()
+        course.students.extend(students)
+        course_ids.append(course.id)
+        student_ids.extend(student.id for student in students)
+    db.session.commit()
+    return professor.id, course_ids, student_ids
+
+
+def writer(app, course_id, roster, stop, interval, latencies, errors):
+    from web_app.attendance import write_attendance
+    from web_app.extensions import db
+
+    rng = random.Random(course_id)
+    day = date(2024, 1, 1)
+    with app.app_context():
+        while not stop.is_set():
+            present = {s for s in roster if rng.random() < 0.8}
+            start = time.perf_counter()
+            try:
+                write_attendance(course_id, present, day)
+                latencies.append(time.perf_counter() - start)
+            except Exception as exc:
+                db.session.rollback()
+                errors.append(repr(exc))
+            day += timedelta(days=1)
+            stop.wait(interval)
+
+
+def reader(app, requests, stop, latencies, errors):
+    client = app.test_client()
+    rng = random.Random(id(latencies))
+    while not stop.is_set():
+        user_id, method, url, data = rng.choice(requests)
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+        start = time.perf_counter()
+        try:
+            response = client.open(url, method=method, data=data)
+            if response.status_code != 200:
+                errors.append(f'{url}: HTTP {response.status_code}')
+            else:
+                latencies.append(time.perf_counter() - start)
+        except Exception as exc:
+            errors.append(repr(exc))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--courses', type=int, default=8,
+                        help='concurrent sessions writing attendance')
+    parser.add_argument('--students', type=int, default=200,
+                        help='roster size per course')
+    parser.add_argument('--readers', type=int, default=8,
+                        help='threads loading reports and dashboards')
+    parser.add_argument('--seconds', type=float, default=20)
+    parser.add_argument('--write-interval', type=float, default=0.2,
+                        help='seconds between write-backs per session')
+    parser.add_argument('--cache', choices=('none', 'memory', 'sqlite'),
+                        default='none',
+                        help='CACHE_BACKEND to run with; the default times '
+                             'every request against the database')
+    parser.add_argument('--database-url',
+                        help='scratch database to seed, which is wiped '
+                             '(default: a temporary SQLite file)')
+    parser.add_argument('--output', help='write results to this JSON file')
+    args = parser.parse_args()
+
+    scratch = use_scratch_database(args.database_url, 'load.db', args.cache)
+
+    from web_app import create_app
+    from web_app.extensions import db
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        professor_id, course_ids, student_ids = seed(args.courses, args.students)
+        rosters = {course_id: student_ids[i * args.students:(i + 1) * args.students]
+                   for i, course_id in enumerate(course_ids)}
+        engine = db.engine.url.render_as_string(hide_password=True)
+
+    requests = [(professor_id, 'POST', '/view_report', {'course': course_id})
+                for course_id in course_ids]
+    requests += [(student_id, 'GET', '/student_dashboard', None)
+                 for student_id in random.Random(0).sample(
+                     student_ids, min(len(student_ids), 50))]
+
+    stop = threading.Event()
+    write_latencies, write_errors = [], []
+    read_latencies, read_errors = [], []
+    threads = [threading.Thread(target=writer, args=(
+        app, course_id, rosters[course_id], stop, args.write_interval,
+        write_latencies, write_errors)) for course_id in course_ids]
+    threads += [threading.Thread(target=reader, args=(
+        app, requests, stop, read_latencies, read_errors))
+        for _ in range(args.readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    result = {
+        'database': engine,
+        'cache_backend': args.cache,
+        'sqlite_wal': app.config['SQLITE_WAL'],
+        'courses': args.courses,
+        'students_per_course': args.students,
+        'readers': args.readers,
+        'seconds': args.seconds,
+        'writes': percentiles(write_latencies),
+        'write_errors': len(write_errors),
+        'reads': percentiles(read_latencies),
+        'read_errors': len(read_errors),
+        'sample_errors': (write_errors + read_errors)[:5],
+    }
+    for role in ('writes', 'reads'):
+        stats = result[role]
+        if stats['count']:
+            print(f"{role}: {stats['count']} in {args.seconds:.0f}s, "
+                  f"p50 {stats['p50_ms']:.1f} ms, p95 {stats['p95_ms']:.1f} ms, "
+                  f"max {stats['max_ms']:.1f} ms")
+    print(f"errors: {result['write_errors']} writes, {result['read_errors']} reads")
+
+    if args.output:
+        write_results(args.output, 'db_load_test', vars(args), result)
+    scratch.cleanup()
+
+
+if __name__ == '__main__':
+    main()
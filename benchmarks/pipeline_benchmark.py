@@ -0,0 +1,173 @@
+"""Measure recognition throughput per stage on synthetic classroom frames.
+
+Each frame holds N drawn faces at known positions. Detection runs MTCNN on
+the frame (skipped when mtcnn is not installed); alignment and embedding use
+the known face positions, so they are measured even without a detector
+(embedding needs FACE_EMBEDDING_MODEL); matching assigns the frame's faces
+against galleries of each size, with the exact matcher and the IVF index,
+using random embeddings when no model is configured.
+
+Run from the repository root:
+
+    python -m benchmarks.pipeline_benchmark --faces 10 30 60 \\
+        --gallery-sizes 100 1000 10000 100000 --output pipeline.json
+"""
+import argparse
+
+import cv2
+import numpy as np
+
+from web_app.faceDetection.ann import IVFIndex
+from web_app.faceDetection.embedding import (FaceModelError, align_face, detect_faces,
+                                            embed_faces)
+from web_app.faceDetection.gallery import FaceGallery
+from web_app.faceDetection.matcher import FaceMatcher
+from benchmarks.common import percentiles, repeat, write_results
+
+FRAME_WIDTH = 1920
+FRAME_HEIGHT = 1080
+# SFace embedding size, used for random queries when no model is configured
+EMBEDDING_DIM = 128
+
+
+def synthetic_classroom(faces, rng):
+    """Draw a frame with `faces` cartoon faces; return it and their detections."""
+    frame = np.full((FRAME_HEIGHT, FRAME_WIDTH, 3), 90, np.uint8)
+    frame += rng.integers(0, 20, frame.shape, dtype=np.uint8)
+    columns = int(np.ceil(np.sqrt(faces * FRAME_WIDTH / FRAME_HEIGHT)))
+    rows = int(np.ceil(faces / columns))
+    cell_w, cell_h = FRAME_WIDTH // columns, FRAME_HEIGHT // rows
+    size = int(min(cell_w, cell_h) * 0.6)
+
+    detections = []
+    for i in range(faces):
+        cx = (i % columns) * cell_w + cell_w // 2
+        cy = (i // columns) * cell_h + cell_h // 2
+        skin = tuple(int(c) for c in rng.integers(120, 230, 3))
+        cv2.ellipse(frame, (cx, cy), (size // 2, int(size * 0.6)), 0, 0, 360, skin, -1)
+        left_eye = (cx - size // 5, cy - size // 8)
+        right_eye = (cx + size // 5, cy - size // 8 + int(rng.integers(-3, 4)))
+        for eye in (left_eye, right_eye):
+            cv2.circle(frame, eye, max(size // 14, 2), (30, 30, 30), -1)
+        cv2.ellipse(frame, (cx, cy + size // 4), (size // 6, size // 14),
+                    0, 0, 180, (60, 20, 20), -1)
+        detections.append({
+            'box': [cx - size // 2, cy - int(size * 0.6), size, int(size * 1.2)],
+            'confidence': 1.0,
+            'keypoints': {'left_eye': left_eye, 'right_eye': right_eye},
+        })
+    return frame, detections
+
+
+def gallery_with(identities, known, rng):
+    """Random unit embeddings, with the frame's faces enrolled as the first ids."""
+    dim = known.shape[1]
+    embeddings = rng.standard_normal((identities, dim)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    embeddings[:len(known)] = known
+    return FaceGallery(embeddings, np.arange(identities), np.arange(identities))
+
+
+def stage(samples, faces):
+    result = percentiles(samples)
+    if samples:
+        result['faces_per_s'] = faces / float(np.median(samples))
+    return result
+
+
+def run_detection(frame, faces, runs):
+    try:
+        samples = repeat(lambda: detect_faces(frame), runs)
+    except ImportError as e:
+        return {'available': False, 'reason': str(e)}
+    result = stage(samples, faces)
+    result['faces_found'] = len(detect_faces(frame))
+    return result
+
+
+def run_embedding(aligned, faces, runs, rng):
+    """Time embedding; returns (stats, the frame's embeddings)."""
+    try:
+        queries = embed_faces(aligned)
+    except FaceModelError as e:
+        queries = rng.standard_normal((faces, EMBEDDING_DIM)).astype(np.float32)
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+        return {'available': False, 'reason': str(e)}, queries
+    return stage(repeat(lambda: embed_faces(aligned), runs), faces), queries
+
+
+def run(faces, gallery_sizes, runs, nprobe, detect, seed):
+    rng = np.random.default_rng(seed)
+    frame, detections = synthetic_classroom(faces, rng)
+    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+    aligned = [align_face(rgb, d) for d in detections]
+    embed, queries = run_embedding(aligned, faces, runs, rng)
+    result = {
+        'faces_per_frame': faces,
+        'embedding_dim': int(queries.shape[1]),
+        'detect': run_detection(rgb, faces, runs) if detect else {'available': False,
+                                                                   'reason': 'skipped'},
+        'align': stage(repeat(lambda: [align_face(rgb, d) for d in detections], runs), faces),
+        'embed': embed,
+        'match': [],
+    }
+
+    for size in gallery_sizes:
+        gallery = gallery_with(max(size, faces), queries, rng)
+        exact = FaceMatcher(gallery, threshold=0.5)
+        ivf = IVFIndex.from_gallery(gallery, nprobe=nprobe, threshold=0.5)
+        enrolled = set(range(faces))
+        result['match'].append({
+            'gallery_size': len(gallery),
+            'exact': stage(repeat(lambda: exact.assign(queries), runs), faces),
+            'exact_recall': len({m.user_id for m in exact.assign(queries)} & enrolled) / faces,
+            'ivf_nlist': ivf.nlist,
+            'ivf_nprobe': nprobe,
+            'ivf': stage(repeat(lambda: ivf.assign(queries), runs), faces),
+            'ivf_recall': len({m.user_id for m in ivf.assign(queries)} & enrolled) / faces,
+        })
+    return result
+
+
+def print_stage(name, stats):
+    if stats.get('count'):
+        print(f"  {name:<22} p50 {stats['p50_ms']:8.2f} ms/frame  "
+              f"{stats['faces_per_s']:10.0f} faces/s")
+    else:
+        print(f"  {name:<22} n/a ({stats.get('reason', 'no samples')})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--faces', type=int, nargs='+', default=[10, 30, 60],
+                        help='faces per frame')
+    parser.add_argument('--gallery-sizes', type=int, nargs='+',
+                        default=[100, 1000, 10000, 100000])
+    parser.add_argument('--runs', type=int, default=20,
+                        help='timed repetitions per stage')
+    parser.add_argument('--nprobe', type=int, default=8)
+    parser.add_argument('--no-detect', action='store_true',
+                        help='skip MTCNN detection')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write results to this JSON file')
+    args = parser.parse_args()
+
+    results = []
+    for faces in args.faces:
+        result = run(faces, args.gallery_sizes, args.runs, args.nprobe,
+                     not args.no_detect, args.seed)
+        results.append(result)
+        print(f"{faces} faces per frame:")
+        for name in ('detect', 'align', 'embed'):
+            print_stage(name, result[name])
+        for row in result['match']:
+            print_stage(f"match exact {row['gallery_size']}", row['exact'])
+            print_stage(f"match ivf {row['gallery_size']}", row['ivf'])
+
+    if args.output:
+        write_results(args.output, 'pipeline_benchmark', vars(args), results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""Time the dashboard and report endpoints against a large seeded database.
+
+Seeds a scratch database with synthetic professors, courses, students,
+enrollments, closed class sessions and their attendance, then requests
+student_dashboard, view_report and view_student_attendance through the
+Flask test client. The response cache is off unless --cache names a
+backend, so the default times the queries rather than cache hits.
+
+Run from the repository root (the default is a temporary SQLite file; pass
+--database-url to benchmark against a server database you can wipe, since
+its tables are dropped first. DATABASE_URL is ignored):
+
+    python -m benchmarks.report_benchmark --students 5000 --courses 50 \\
+        --sessions 40 --output reports.json
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+from benchmarks.common import (percentiles, repeat, timed, use_scratch_database,
+                               write_results)
+
+
+def seed(courses, students, courses_per_student, sessions, present_rate, rng):
+    """Bulk-insert the synthetic dataset; returns (professor ids, course ids,
+    {student id: course ids})."""
+    from web_app.attendance import rebuild_summary
+    from web_app.extensions import db
+    from web_app.models import (Attendance, ClassSession, Course, User,
+                                enrollment_table)
+
+    professors = max(1, courses // 5)
+    db.session.execute(db.insert(User), [
+        {'id': i + 1, 'name': f'Professor {i}', 'email': f'professor-{i}@example.com',
+         'password': 'x', 'role': 'professor'} for i in range(professors)])
+    student_ids = list(range(professors + 1, professors + students + 1))
+    db.session.execute(db.insert(User), [
+        {'id': s, 'name': f'Student {s}', 'email': f'student-{s}@example.com',
+         'password': 'x', 'role': 'student', 'enrollment_number': f'{s:010d}'}
+        for s in student_ids])
+
+    course_ids = list(range(1, courses + 1))
+    db.session.execute(db.insert(Course), [
+        {'id': c, 'name': f'Course {c}', 'professor_id': (c - 1) % professors + 1}
+        for c in course_ids])
+
+    enrolled = {s: rng.sample(course_ids, min(courses_per_student, courses))
+                for s in student_ids}
+    db.session.execute(enrollment_table.insert(), [
+        {'user_id': s, 'course_id': c} for s, cs in enrolled.items() for c in cs])
+
+    rosters = {c: [] for c in course_ids}
+    for s, cs in enrolled.items():
+        for c in cs:
+            rosters[c].append(s)
+
+    first_day = date(2024, 1, 8)
+    session_id = 0
+    for c in course_ids:
+        rows = []
+        for n in range(sessions):
+            session_id += 1
+            day = first_day + timedelta(days=n)
+            db.session.execute(db.insert(ClassSession), [{
+                'id': session_id, 'course_id': c, 'date': day,
+                'start_time': day, 'end_time': day, 'status': 'closed'}])
+            rows.extend({'student_id': s, 'course_id': c, 'date': day,
+                         'session_id': session_id,
+                         'status': 'Present' if rng.random() < present_rate else 'Absent'}
+                        for s in rosters[c])
+        db.session.execute(db.insert(Attendance), rows)
+    db.session.commit()
+    rebuild_summary()
+    return list(range(1, professors + 1)), course_ids, enrolled
+
+
+def login(client, user_id):
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+
+
+def time_endpoint(client, user_id, method, url, data, runs):
+    login(client, user_id)
+
+    def request():
+        response = client.open(url, method=method, data=data)
+        if response.status_code != 200:
+            raise RuntimeError(f'{method} {url} returned HTTP {response.status_code}')
+    return percentiles(repeat(request, runs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--students', type=int, default=5000)
+    parser.add_argument('--courses', type=int, default=50)
+    parser.add_argument('--courses-per-student', type=int, default=5)
+    parser.add_argument('--sessions', type=int, default=40,
+                        help='closed class sessions per course')
+    parser.add_argument('--present-rate', type=float, default=0.85)
+    parser.add_argument('--runs', type=int, default=30,
+                        help='timed requests per endpoint')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--cache', choices=('none', 'memory', 'sqlite'),
+                        default='none',
+                        help='CACHE_BACKEND to run with; the default times '
+                             'every request against the database')
+    parser.add_argument('--database-url',
+                        help='scratch database to seed, which is wiped '
+                             '(default: a temporary SQLite file)')
+    parser.add_argument('--output', help='write results to this JSON file')
+    args = parser.parse_args()
+
+    scratch = use_scratch_database(args.database_url, 'reports.db', args.cache)
+
+    from web_app import create_app
+    from web_app.extensions import db
+
+    app = create_app()
+    rng = random.Random(args.seed)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        (professors, course_ids, enrolled), seed_seconds = timed(
+            seed, args.courses, args.students, args.courses_per_student,
+            args.sessions, args.present_rate, rng)
+        attendance_rows = sum(map(len, enrolled.values())) * args.sessions
+        course_professor = {c: (c - 1) % len(professors) + 1 for c in course_ids}
+        backend = db.engine.url.get_backend_name()
+
+    print(f'Seeded {attendance_rows} attendance rows in {seed_seconds:.1f}s')
+
+    # The same sampled users and courses on every run, so results compare
+    student_id = rng.choice(list(enrolled))
+    course_id = enrolled[student_id][0]
+    client = app.test_client()
+    endpoints = {
+        'student_dashboard': (student_id, 'GET', '/student_dashboard', None),
+        'view_report': (course_professor[course_id], 'POST', '/view_report',
+                        {'course': course_id}),
+        'view_student_attendance': (
+            course_professor[course_id], 'GET',
+            f'/view_student_attendance/{course_id}/{student_id}', None),
+    }
+
+    results = {
+        'database': backend,
+        'cache_backend': args.cache,
+        'attendance_rows': attendance_rows,
+        'seed_s': seed_seconds,
+        'endpoints': {},
+    }
+    started = time.perf_counter()
+    for name, (user_id, method, url, data) in endpoints.items():
+        stats = time_endpoint(client, user_id, method, url, data, args.runs)
+        results['endpoints'][name] = stats
+        print(f"{name:<26} p50 {stats['p50_ms']:7.2f} ms  p95 {stats['p95_ms']:7.2f} ms")
+    results['total_s'] = time.perf_counter() - started
+
+    if args.output:
+        write_results(args.output, 'report_benchmark', vars(args), results)
+    scratch.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+import os
+
+# Config reads the environment at import: give every test an in-memory
+# database and no response cache, whatever the shell exports
+os.environ['DATABASE_URL'] = 'sqlite://'
+os.environ['CACHE_BACKEND'] = 'none'
+os.environ.pop('ATTENDANCE_JOURNAL_DIR', None)
+
+import pytest
+
+from web_app import create_app
+from web_app.extensions import db
+from web_app.models import Course, User
+
+
+@pytest.fixture
+def app():
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def course(app):
+    """A course with three enrolled students; returns (course id, student ids)."""
+    professor = User(name='Professor', email='professor@example.com',
+                     password='x', role='professor')
+    students = [User(name=f'Student {i}', email=f'student-{i}@example.com',
+                     password='x', role='student',
+                     enrollment_number=f'{i:010d}') for i in range(3)]
+    db.session.add(professor)
+    db.session.flush()
+    course = Course(name='Course', professor_id=professor.id, students=students)
+    db.session.add(course)
+    db.session.commit()
+    return course.id, [student.id for student in students]
@@ -0,0 +1,127 @@
+import numpy as np
+import pytest
+
+from web_app.extensions import db
+from web_app.models import Image
+from web_app.faceDetection import ann, gallery as gallery_module
+from web_app.faceDetection.ann import IVFIndex
+from web_app.faceDetection.gallery import FaceGallery, encode_embedding
+from web_app.faceDetection.matcher import FaceMatcher
+
+
+def unit(vectors):
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+@pytest.fixture
+def gallery():
+    rng = np.random.default_rng(0)
+    embeddings = unit(rng.standard_normal((2000, 64)))
+    return FaceGallery(embeddings, np.arange(2000), np.arange(2000))
+
+
+def noisy_queries(gallery, count, seed=1):
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(gallery), count, replace=False)
+    return unit(gallery.embeddings[rows] + 0.05 * rng.standard_normal(
+        (count, gallery.dim))), gallery.user_ids[rows]
+
+
+def best(matcher, queries):
+    return [m[0].user_id if m else None for m in matcher.match(queries)]
+
+
+def test_full_probe_equals_exact(gallery):
+    queries, _ = noisy_queries(gallery, 200)
+    exact = FaceMatcher(gallery, threshold=-1.0, top_k=1)
+    index = IVFIndex.from_gallery(gallery, nlist=32, threshold=-1.0, top_k=1)
+    index.nprobe = index.nlist
+    assert best(index, queries) == best(exact, queries)
+
+
+def test_recall_against_exact(gallery):
+    queries, truth = noisy_queries(gallery, 200)
+    exact = FaceMatcher(gallery, threshold=-1.0, top_k=1)
+    assert best(exact, queries) == list(truth)
+
+    index = IVFIndex.from_gallery(gallery, nlist=32, nprobe=8, threshold=-1.0, top_k=1)
+    recall = np.mean([a == b for a, b in zip(best(index, queries), truth)])
+    assert recall >= 0.95
+
+
+def test_replace_and_remove_match_exact(gallery):
+    rng = np.random.default_rng(2)
+    exact = FaceMatcher(gallery, threshold=-1.0, top_k=1)
+    index = IVFIndex.from_gallery(gallery, nlist=32, threshold=-1.0, top_k=1)
+    index.nprobe = index.nlist
+
+    moved = unit(rng.standard_normal((2, gallery.dim)))
+    for matcher in (exact, index):
+        matcher.replace(7, moved)
+        matcher.remove(11)
+
+    queries = np.vstack([moved, gallery.embeddings[[11, 12]]])
+    assert best(index, queries) == best(exact, queries)
+    assert best(exact, queries)[:2] == [7, 7]
+    assert 11 not in best(index, queries)
+    assert len(index) == len(exact) == 1999
+
+
+def test_empty_index_trains_on_first_enrollments(gallery):
+    index = IVFIndex.from_gallery(FaceGallery.empty(), threshold=-1.0, top_k=1)
+    assert index.nlist == 0
+    assert index.match(gallery.embeddings[:2]) == [[], []]
+
+    index.replace_many({int(u): (gallery.embeddings[[u]], None) for u in range(100)})
+    assert index.nlist == 40 and len(index) == 100
+    assert best(index, gallery.embeddings[:5]) == [0, 1, 2, 3, 4]
+
+
+def test_retrains_when_the_gallery_outgrows_its_training(gallery):
+    index = IVFIndex.from_gallery(gallery.subset(gallery.user_ids < 100))
+    assert index.nlist == 40
+
+    index.replace_many({int(u): (gallery.embeddings[[u]], None) for u in range(100, 200)})
+    assert index.nlist == 40
+    index.replace_many({int(u): (gallery.embeddings[[u]], None) for u in range(200, 400)})
+    assert index.nlist == 80 and len(index) == 400
+
+
+def test_replace_many_equals_one_replace_at_a_time(gallery):
+    rng = np.random.default_rng(3)
+    changes = {3: (unit(rng.standard_normal((2, gallery.dim))), [900, 901]),
+               5: ([], None), 2500: (unit(rng.standard_normal((1, gallery.dim))), [902])}
+    one_by_one = FaceMatcher(gallery)
+    for user_id, (embeddings, image_ids) in changes.items():
+        one_by_one.replace(user_id, embeddings, image_ids)
+    batched = FaceMatcher(gallery)
+    batched.replace_many(changes)
+
+    a, b = one_by_one.gallery, batched.gallery
+    assert np.array_equal(a.user_ids, b.user_ids)
+    assert np.array_equal(a.image_ids, b.image_ids)
+    assert np.array_equal(a.embeddings, b.embeddings)
+
+
+def test_sync_applies_changed_students_in_one_rebuild(course, monkeypatch):
+    _, students = course
+    monkeypatch.setattr(gallery_module, 'model_name', lambda: 'test-model')
+    monkeypatch.setattr(ann, '_global_index', IVFIndex.from_gallery(FaceGallery.empty()))
+    monkeypatch.setattr(ann, '_synced_until', None)
+    monkeypatch.setattr(ann, '_synced_images', {})
+    calls = []
+    replace_many = ann._global_index.replace_many
+    monkeypatch.setattr(ann._global_index, 'replace_many',
+                        lambda changes: calls.append(set(changes)) or replace_many(changes))
+
+    rng = np.random.default_rng(4)
+    db.session.add_all(Image(filename=f'{s}.jpg', user_id=s, status='enrolled',
+                             embedding_model='test-model',
+                             embedding=encode_embedding(unit(rng.standard_normal((1, 16)))[0]))
+                       for s in students)
+    db.session.commit()
+
+    assert ann.sync_global_index() == 3
+    assert calls == [set(students)]
+    assert len(ann._global_index) == 3
+    assert ann.sync_global_index() == 0
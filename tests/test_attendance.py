@@ -0,0 +1,102 @@
+from datetime import date
+
+import pytest
+
+from web_app import attendance
+from web_app.attendance import rebuild_summary, write_attendance
+from web_app.extensions import db
+from web_app.models import Attendance, AttendanceSummary
+
+DAY = date(2024, 3, 4)
+
+
+@pytest.fixture(params=['upsert', 'merge'])
+def write_path(request, monkeypatch):
+    # Exercise both INSERT ... ON CONFLICT and the portable fallback
+    if request.param == 'merge':
+        monkeypatch.setattr(attendance, '_upsert_statement', lambda dialect: None)
+    return request.param
+
+
+def statuses(course_id, day=DAY):
+    return {row.student_id: row.status for row in Attendance.query.filter_by(
+        course_id=course_id, date=day)}
+
+
+def summary(course_id):
+    return {row.student_id: (row.sessions_held, row.sessions_attended, row.last_attended)
+            for row in AttendanceSummary.query.filter_by(course_id=course_id)}
+
+
+def test_rerun_upgrades_absent_to_present(course, write_path):
+    course_id, (a, b, c) = course
+    assert write_attendance(course_id, {a}, date=DAY) == 3
+    assert write_attendance(course_id, {b}, date=DAY) == 3
+
+    assert statuses(course_id) == {a: 'Present', b: 'Present', c: 'Absent'}
+    assert Attendance.query.count() == 3
+    assert summary(course_id) == {a: (1, 1, DAY), b: (1, 1, DAY), c: (1, 0, None)}
+
+
+def test_rerun_never_downgrades_or_double_counts(course, write_path):
+    course_id, (a, b, c) = course
+    write_attendance(course_id, {a, b}, date=DAY)
+    write_attendance(course_id, {a}, date=DAY)
+    write_attendance(course_id, {a, b}, date=DAY)
+
+    assert statuses(course_id) == {a: 'Present', b: 'Present', c: 'Absent'}
+    assert Attendance.query.count() == 3
+    assert summary(course_id) == {a: (1, 1, DAY), b: (1, 1, DAY), c: (1, 0, None)}
+
+
+def test_rebuild_summary_matches_incremental(course, write_path):
+    course_id, (a, b, c) = course
+    runs = [(date(2024, 3, 4), {a}), (date(2024, 3, 4), {b}),
+            (date(2024, 3, 5), set()), (date(2024, 3, 6), {a, c}),
+            (date(2024, 3, 6), {a}), (date(2024, 3, 7), {b, c})]
+    for day, present in runs:
+        write_attendance(course_id, present, date=day)
+    incremental = summary(course_id)
+
+    assert rebuild_summary() == 3
+    assert summary(course_id) == incremental
+    assert incremental == {a: (4, 2, date(2024, 3, 6)),
+                           b: (4, 2, date(2024, 3, 7)),
+                           c: (4, 2, date(2024, 3, 7))}
+
+
+def test_rebuild_summary_for_one_course(course):
+    course_id, (a, b, c) = course
+    write_attendance(course_id, {a}, date=DAY)
+    db.session.execute(AttendanceSummary.__table__.update().values(sessions_attended=9))
+    db.session.commit()
+
+    rebuild_summary(course_id)
+    assert summary(course_id) == {a: (1, 1, DAY), b: (1, 0, None), c: (1, 0, None)}
+
+
+def test_accumulator_journals_and_reloads(course, tmp_path):
+    course_id, students = course
+    accumulator = attendance.AttendanceAccumulator(course_id, DAY, journal_dir=tmp_path)
+    accumulator.mark_present(students[0])
+    accumulator.mark_present(students[0])
+    accumulator.mark_present(students[2])
+    assert Attendance.query.count() == 0
+    with open(accumulator.journal_path) as journal:
+        assert journal.read().split() == [str(students[0]), str(students[2])]
+
+    # A restarted server picks the session back up from the journal
+    restarted = attendance.AttendanceAccumulator(course_id, DAY, journal_dir=tmp_path)
+    assert restarted.present == {students[0], students[2]}
+
+
+def test_accumulator_commit_writes_rows_and_removes_journal(course, tmp_path):
+    course_id, students = course
+    accumulator = attendance.AttendanceAccumulator(course_id, DAY, journal_dir=tmp_path)
+    accumulator.mark_present(students[1])
+    accumulator.commit()
+
+    assert statuses(course_id) == {
+        students[0]: 'Absent', students[1]: 'Present', students[2]: 'Absent'}
+    assert not (tmp_path / f'course-{course_id}-{DAY.isoformat()}.journal').exists()
+    assert attendance.AttendanceAccumulator(course_id, DAY, journal_dir=tmp_path).present == set()
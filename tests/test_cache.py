@@ -0,0 +1,107 @@
+import os
+import sqlite3
+from datetime import date
+
+import pytest
+
+from web_app import cache
+from web_app.attendance import write_attendance
+from web_app.config import Config
+
+
+@pytest.fixture
+def shared_cache(app, tmp_path, monkeypatch):
+    """Use the SQLite backend, in this test's own instance folder."""
+    monkeypatch.setattr(cache, '_cache', None)
+    monkeypatch.setattr(Config, 'CACHE_BACKEND', 'sqlite')
+    monkeypatch.setattr(Config, 'CACHE_PATH', None)
+    monkeypatch.setattr(app, 'instance_path', str(tmp_path / 'instance'))
+    return cache.get_cache()
+
+
+def test_shared_cache_lives_in_the_instance_folder(app, shared_cache):
+    assert shared_cache.path == os.path.join(app.instance_path, 'attendance-cache.db')
+
+
+def test_cache_failure_is_a_miss(shared_cache, monkeypatch):
+    def locked(*args):
+        raise sqlite3.OperationalError('database is locked')
+    monkeypatch.setattr(shared_cache, 'get', locked)
+    monkeypatch.setattr(shared_cache, 'set', locked)
+    monkeypatch.setattr(shared_cache, 'delete_many', locked)
+
+    assert cache.cached('report:1', lambda: {'rows': 3})[0] == {'rows': 3}
+    cache.invalidate_attendance(1, [2])
+
+
+def test_locked_cache_file_serves_the_dashboard(app, course, shared_cache):
+    course_id, (student, _, _) = course
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(student)
+    # Another process holding the write lock
+    blocker = sqlite3.connect(shared_cache.path, timeout=0)
+    blocker.execute('BEGIN EXCLUSIVE')
+    try:
+        assert client.get('/student_dashboard').status_code == 200
+    finally:
+        blocker.rollback()
+        blocker.close()
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def any_cache(request, app, tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, '_cache', None)
+    monkeypatch.setattr(Config, 'CACHE_BACKEND', request.param)
+    monkeypatch.setattr(Config, 'CACHE_PATH', str(tmp_path / 'cache.db'))
+    return cache.get_cache()
+
+
+def test_hit_until_invalidated(any_cache):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return len(calls)
+
+    assert cache.cached('course_report:1', compute)[0] == 1
+    assert cache.cached('course_report:1', compute)[0] == 1
+    cache.invalidate_attendance(2, [5])
+    assert cache.cached('course_report:1', compute)[0] == 1
+    cache.invalidate_attendance(1, [5])
+    assert cache.cached('course_report:1', compute)[0] == 2
+    cache.invalidate_attendance(3)
+    assert cache.cached('course_report:1', compute)[0] == 3
+
+
+@pytest.mark.parametrize('student_ids', [[5], None])
+def test_value_read_before_invalidation_is_not_served(any_cache, student_ids):
+    numbers = {'held': 1}
+
+    def compute_during_commit():
+        # The request reads the old numbers, then the worker commits
+        old = dict(numbers)
+        numbers['held'] = 2
+        cache.invalidate_attendance(1, student_ids)
+        return old
+
+    assert cache.cached('course_report:1', compute_during_commit)[0] == {'held': 1}
+    assert cache.cached('course_report:1', lambda: dict(numbers))[0] == {'held': 2}
+
+
+def test_dashboard_etag(app, course, any_cache):
+    course_id, (student, _, _) = course
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(student)
+
+    first = client.get('/student_dashboard')
+    assert first.status_code == 200 and first.headers['ETag']
+    assert client.get('/student_dashboard', headers={
+        'If-None-Match': first.headers['ETag']}).status_code == 304
+
+    write_attendance(course_id, {student}, date=date(2024, 3, 4))
+    changed = client.get('/student_dashboard', headers={
+        'If-None-Match': first.headers['ETag']})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != first.headers['ETag']
@@ -0,0 +1,61 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from web_app.config import Config
+from web_app.extensions import db
+from web_app.jobs import claim_pending_images, queue_enrollment, reclaim_stale_images
+from web_app.models import Image, User
+from web_app.faceDetection import enrollment
+
+
+# Module-level so spawned pool processes can import them
+def embedded(path):
+    return 'enrolled', None
+
+
+def crash(path):
+    os._exit(1)
+
+
+@pytest.fixture
+def student(course):
+    _, (student_id, _, _) = course
+    return db.session.get(User, student_id)
+
+
+def test_queued_images_are_claimed_once(student):
+    images = queue_enrollment(student, ['a.jpg', 'b.jpg', 'a.jpg'])
+    assert [image.status for image in images] == ['pending', 'pending']
+
+    first = claim_pending_images(1)
+    assert first == [images[0].id]
+    assert claim_pending_images(5) == [images[1].id]
+    assert claim_pending_images(5) == []
+    assert db.session.get(Image, images[0].id).status == 'processing'
+
+
+def test_stale_processing_images_are_queued_again(student):
+    image, = queue_enrollment(student, ['a.jpg'])
+    claim_pending_images(1)
+    assert reclaim_stale_images(timeout=60) == 0
+
+    Image.query.update({'updated_at': datetime.now() - timedelta(hours=1)})
+    db.session.commit()
+    assert reclaim_stale_images(timeout=60) == 1
+    assert claim_pending_images(1) == [image.id]
+
+
+def test_dead_process_fails_only_its_image(app, monkeypatch):
+    monkeypatch.setattr(Config, 'ENROLLMENT_PROCESSES', 2)
+    monkeypatch.setattr(enrollment, '_processes', None)
+    monkeypatch.setattr(enrollment, '_pool_started', False)
+    try:
+        results = enrollment._embed_all(
+            [(embedded, 'a'), (crash, 'b'), (embedded, 'c')])
+        assert [status for status, _ in results] == ['enrolled', 'failed', 'enrolled']
+        # The pool was rebuilt, so later batches still run
+        assert enrollment._embed_all([(embedded, 'd')]) == [('enrolled', None)]
+    finally:
+        enrollment.shutdown_enrollment()
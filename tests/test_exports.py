@@ -0,0 +1,86 @@
+import csv
+import io
+import json
+from datetime import date, timedelta
+
+import pytest
+
+from web_app import exports
+from web_app.attendance import write_attendance
+from web_app.extensions import db
+from web_app.models import Course, User
+
+FIRST_DAY = date(2024, 3, 4)
+
+
+@pytest.fixture
+def client(app, course):
+    course_id, students = course
+    for n in range(3):
+        write_attendance(course_id, set(students[:n + 1]), date=FIRST_DAY + timedelta(days=n))
+    professor_id = db.session.get(Course, course_id).professor_id
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(professor_id)
+    return client
+
+
+def read_csv(response):
+    return list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+
+
+def test_csv_export_streams_every_row(client, course):
+    course_id, students = course
+    response = client.get('/export_attendance')
+    assert response.status_code == 200 and response.is_streamed
+    assert response.mimetype == 'text/csv'
+
+    rows = read_csv(response)
+    assert list(rows[0]) == exports.EXPORT_COLUMNS
+    assert len(rows) == 9
+    assert [row['date'] for row in rows[:3]] == [FIRST_DAY.isoformat()] * 3
+    assert {row['status'] for row in rows if row['date'] == FIRST_DAY.isoformat()
+            and int(row['student_id']) == students[0]} == {'Present'}
+
+
+def test_date_range_filter(client):
+    response = client.get('/export_attendance', query_string={
+        'date_from': (FIRST_DAY + timedelta(days=1)).isoformat(),
+        'date_to': (FIRST_DAY + timedelta(days=1)).isoformat()})
+    rows = read_csv(response)
+    assert len(rows) == 3
+    assert [row['status'] for row in rows] == ['Present', 'Present', 'Absent']
+
+
+def test_ndjson_export(client, course):
+    course_id, _ = course
+    response = client.get('/export_attendance', query_string={
+        'format': 'ndjson', 'course': course_id})
+    assert response.mimetype == 'application/x-ndjson'
+    records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert len(records) == 9
+    assert records[0]['course_id'] == course_id
+    assert records[0]['date'] == FIRST_DAY.isoformat()
+
+
+def test_other_professors_course_is_refused(client):
+    other = User(name='Other', email='other@example.com', password='x', role='professor')
+    db.session.add(other)
+    db.session.flush()
+    course = Course(name='Other course', professor_id=other.id)
+    db.session.add(course)
+    db.session.commit()
+
+    response = client.get('/export_attendance', query_string={'course': course.id})
+    assert response.status_code == 302
+
+
+def test_rows_are_sent_in_batches(client, monkeypatch):
+    monkeypatch.setattr(exports, 'EXPORT_BATCH_SIZE', 2)
+    course_id = db.session.scalar(db.select(Course.id))
+    chunks = list(exports.stream_csv(exports.attendance_rows([course_id])))
+    # The header and two rows, then two rows per chunk
+    assert len(chunks) == 5
+    assert sum(chunk.count('\n') for chunk in chunks) == 10
+    ndjson = list(exports.stream_ndjson(exports.attendance_rows([course_id])))
+    assert [chunk.count('\n') for chunk in ndjson] == [2, 2, 2, 2, 1]
@@ -0,0 +1,61 @@
+import pytest
+
+from web_app.extensions import db
+from web_app.identity import UserSnapshot, _snapshots, load_identity
+from web_app.models import User
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(app):
+    # Every test's database reuses the same user ids
+    _snapshots.clear()
+
+
+def add_user(role='student'):
+    user = User(name='Someone', email='someone@example.com', password='x', role=role)
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def test_snapshot_is_cached(app):
+    user = add_user()
+    snapshot = load_identity(user.id)
+    assert isinstance(snapshot, UserSnapshot) and snapshot.role == 'student'
+    assert load_identity(user.id) is snapshot
+
+
+def test_change_evicts_only_after_commit(app):
+    user = add_user()
+    load_identity(user.id)
+
+    user.role = 'professor'
+    db.session.flush()
+    # A request running now must not cache the uncommitted row
+    assert _snapshots.get(user.id) is not None
+    db.session.commit()
+    assert _snapshots.get(user.id) is None
+    assert load_identity(user.id).role == 'professor'
+
+
+def test_rollback_keeps_the_snapshot(app):
+    user = add_user()
+    load_identity(user.id)
+
+    user.role = 'professor'
+    db.session.flush()
+    db.session.rollback()
+    assert load_identity(user.id).role == 'student'
+    # A later unrelated commit evicts nothing left over from the rollback
+    db.session.commit()
+    assert _snapshots.get(user.id) is not None
+
+
+def test_deleted_user_is_forgotten(app):
+    user = add_user()
+    user_id = user.id
+    load_identity(user_id)
+
+    db.session.delete(user)
+    db.session.commit()
+    assert load_identity(user_id) is None
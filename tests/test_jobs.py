@@ -0,0 +1,97 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from web_app.extensions import db
+from web_app.jobs import claim_next_job, enqueue_job, reclaim_stale_jobs, record_heartbeat
+from web_app.models import ClassSession, RecognitionJob
+from web_app.faceDetection.mtcnn_webcam import close_orphaned_session
+from web_app.faceDetection.sessions import SessionError
+
+
+@pytest.fixture
+def class_session(course):
+    course_id, _ = course
+    class_session = ClassSession(course_id=course_id, date=date(2024, 3, 4))
+    db.session.add(class_session)
+    db.session.commit()
+    return class_session
+
+
+def run_on(class_session, worker_id, heartbeat=None):
+    class_session.worker_id = worker_id
+    class_session.heartbeat_at = heartbeat or datetime.now()
+    db.session.commit()
+
+
+def test_claims_oldest_job_once(course):
+    course_id, _ = course
+    first = enqueue_job('start', course_id)
+    enqueue_job('start', course_id)
+
+    assert claim_next_job().id == first.id
+    assert claim_next_job().id == first.id + 1
+    assert claim_next_job() is None
+
+
+def test_stop_goes_to_the_worker_running_the_class(class_session):
+    run_on(class_session, 'host-a:1')
+    stop = enqueue_job('stop', class_session.course_id)
+    assert stop.session_id == class_session.id
+
+    assert claim_next_job('host-b:2') is None
+    assert claim_next_job('host-a:1').id == stop.id
+
+
+def test_stop_of_dead_worker_goes_to_any_worker(class_session):
+    run_on(class_session, 'host-a:1', datetime.now() - timedelta(hours=1))
+    stop = enqueue_job('stop', class_session.course_id)
+
+    assert claim_next_job('host-b:2').id == stop.id
+
+
+def test_stop_waits_for_its_start(class_session):
+    start = enqueue_job('start', class_session.course_id, class_session.id)
+    stop = enqueue_job('stop', class_session.course_id)
+
+    assert claim_next_job('host-a:1').id == start.id
+    assert claim_next_job('host-b:2') is None
+    run_on(class_session, 'host-a:1')
+    assert claim_next_job('host-a:1').id == stop.id
+
+
+def test_heartbeat_keeps_the_class_owned(class_session):
+    run_on(class_session, 'host-a:1', datetime.now() - timedelta(hours=1))
+    record_heartbeat('host-a:1')
+    enqueue_job('stop', class_session.course_id)
+
+    assert claim_next_job('host-b:2') is None
+
+
+def test_reclaim_requeues_stops_and_fails_starts(course):
+    course_id, _ = course
+    start = enqueue_job('start', course_id)
+    stop = enqueue_job('stop', course_id)
+    claim_next_job()
+    claim_next_job()
+    RecognitionJob.query.update({'started_at': datetime.now() - timedelta(hours=1)})
+    db.session.commit()
+
+    assert reclaim_stale_jobs(timeout=60) == 2
+    assert db.session.get(RecognitionJob, start.id).status == 'failed'
+    assert db.session.get(RecognitionJob, stop.id).status == 'queued'
+    assert reclaim_stale_jobs(timeout=60) == 0
+
+
+def test_orphan_close_spares_a_live_worker(class_session):
+    run_on(class_session, 'host-a:1')
+    with pytest.raises(SessionError, match='host-a:1'):
+        close_orphaned_session(class_session.course_id, 'host-b:2')
+    assert class_session.status == 'active'
+
+
+def test_orphan_close_fails_a_dead_workers_class(class_session):
+    run_on(class_session, 'host-a:1', datetime.now() - timedelta(hours=1))
+    with pytest.raises(SessionError, match='without recording attendance'):
+        close_orphaned_session(class_session.course_id, 'host-b:2')
+    assert class_session.status == 'failed'
@@ -0,0 +1,32 @@
+from web_app.faceDetection.pipeline import ReorderBuffer
+
+
+def test_late_frame_overtakes_held_frames():
+    buffer = ReorderBuffer(delay=1.0, capacity=8)
+    buffer.push(12, 'region', now=0.0)
+    buffer.push(13, 'region', now=0.1)
+    assert buffer.pop_ready(now=0.5) == []
+
+    # The refresh pass on frame 10 finishes last
+    buffer.push(10, 'refresh', now=0.6)
+    assert buffer.pop_ready(now=1.0) == ['refresh', 'region']
+    assert buffer.pop_ready(now=1.1) == ['region']
+    assert buffer.stale == 0
+
+
+def test_frame_after_a_newer_release_is_stale():
+    buffer = ReorderBuffer(delay=1.0, capacity=8)
+    buffer.push(5, 'a', now=0.0)
+    assert buffer.pop_ready(now=1.0) == ['a']
+    buffer.push(4, 'late', now=1.5)
+    assert buffer.stale == 1 and len(buffer) == 0
+
+
+def test_capacity_and_flush_release_in_order():
+    buffer = ReorderBuffer(delay=10.0, capacity=2)
+    for sequence in (3, 1, 2):
+        buffer.push(sequence, sequence, now=0.0)
+    assert buffer.pop_ready(now=0.0) == [1]
+    assert buffer.next_deadline() == 10.0
+    assert buffer.pop_ready(now=0.0, flush=True) == [2, 3]
+    assert buffer.next_deadline() is None
@@ -0,0 +1,79 @@
+from datetime import date, timedelta
+
+from web_app.attendance import write_attendance
+from web_app.extensions import db
+from web_app.models import Attendance, Course, User
+from web_app.reports import attendance_page, course_report, student_summary
+
+FIRST_DAY = date(2024, 1, 1)
+
+
+def record_days(course_id, student_id, days):
+    db.session.add_all(Attendance(course_id=course_id, student_id=student_id,
+                                  date=FIRST_DAY + timedelta(days=n), status='Present')
+                       for n in range(days))
+    db.session.commit()
+
+
+def all_pages(course_id, student_id, limit, **filters):
+    pages, before = [], None
+    while True:
+        records, before = attendance_page(course_id, student_id, before=before,
+                                          limit=limit, **filters)
+        pages.append([record.date for record in records])
+        if before is None:
+            return pages
+
+
+def test_pages_cover_every_day_once_newest_first(course):
+    course_id, (student, _, _) = course
+    record_days(course_id, student, 7)
+
+    pages = all_pages(course_id, student, limit=3)
+    assert [len(page) for page in pages] == [3, 3, 1]
+    days = [day for page in pages for day in page]
+    assert days == [FIRST_DAY + timedelta(days=n) for n in reversed(range(7))]
+
+
+def test_full_last_page_has_no_next(course):
+    course_id, (student, _, _) = course
+    record_days(course_id, student, 6)
+
+    pages = all_pages(course_id, student, limit=3)
+    assert [len(page) for page in pages] == [3, 3]
+
+
+def test_pages_respect_date_range_and_student(course):
+    course_id, (student, other, _) = course
+    record_days(course_id, student, 10)
+    record_days(course_id, other, 10)
+
+    pages = all_pages(course_id, student, limit=2,
+                      date_from=FIRST_DAY + timedelta(days=2),
+                      date_to=FIRST_DAY + timedelta(days=6))
+    days = [day for page in pages for day in page]
+    assert days == [FIRST_DAY + timedelta(days=n) for n in (6, 5, 4, 3, 2)]
+    assert [len(page) for page in pages] == [2, 2, 1]
+
+
+def test_empty_history(course):
+    course_id, (student, _, _) = course
+    assert attendance_page(course_id, student) == ([], None)
+
+
+def test_late_enrollee_is_measured_from_joining(course):
+    course_id, (a, b, c) = course
+    late = User(name='Late', email='late@example.com', password='x', role='student',
+                enrollment_number='9999999999')
+    db.session.add(late)
+    write_attendance(course_id, {a}, date=FIRST_DAY)
+    write_attendance(course_id, {a, b}, date=FIRST_DAY + timedelta(days=1))
+    late.courses.append(db.session.get(Course, course_id))
+    db.session.commit()
+    late = late.id
+    write_attendance(course_id, {late}, date=FIRST_DAY + timedelta(days=2))
+
+    percentages = {row['id']: row['attendance_percentage'] for row in course_report(course_id)}
+    assert percentages == {a: 66.67, b: 33.33, c: 0, late: 100}
+    summary, = student_summary(late)
+    assert (summary['attended'], summary['missed'], summary['percentage']) == (1, 0, 100)
@@ -0,0 +1,70 @@
+from datetime import date
+
+import pytest
+
+from web_app.extensions import db
+from web_app.models import Attendance, ClassSession
+from web_app.faceDetection import mtcnn_webcam
+
+
+class FakePipeline:
+    def __init__(self, attendance):
+        self.attendance = attendance
+        self.labels = {'course': attendance.course_id, 'classroom': ''}
+        self.recognized = attendance.present
+
+
+class FakeManager:
+    # Stands in for SessionManager so no camera or detector is started
+    def __init__(self):
+        self.sessions = {}
+
+    def get(self, course_id):
+        return self.sessions.get(course_id)
+
+    def start(self, course_id, index, classroom=None, attendance=None):
+        self.sessions[course_id] = FakePipeline(attendance)
+        return self.sessions[course_id]
+
+    def stop(self, course_id):
+        return self.sessions.pop(course_id, None)
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    manager = FakeManager()
+    monkeypatch.setattr(mtcnn_webcam, 'session_manager', manager)
+    monkeypatch.setattr(mtcnn_webcam, 'require_face_model', lambda: None)
+    monkeypatch.setattr(mtcnn_webcam, 'build_course_index', lambda course_id: None)
+    return manager
+
+
+def open_session(course_id, day):
+    class_session = ClassSession(course_id=course_id, date=day)
+    db.session.add(class_session)
+    db.session.commit()
+    return class_session
+
+
+def test_start_returns_the_running_class(course, manager):
+    course_id, _ = course
+    today = open_session(course_id, date(2024, 3, 5))
+    pipeline = mtcnn_webcam.start_face_detection(course_id, class_session=today)
+    assert mtcnn_webcam.start_face_detection(course_id, class_session=today) is pipeline
+
+
+def test_start_closes_a_class_that_was_never_ended(course, manager):
+    course_id, (student, _, _) = course
+    yesterday = open_session(course_id, date(2024, 3, 4))
+    today = open_session(course_id, date(2024, 3, 5))
+    mtcnn_webcam.start_face_detection(course_id, class_session=yesterday)
+    manager.get(course_id).attendance.mark_present(student)
+
+    pipeline = mtcnn_webcam.start_face_detection(course_id, class_session=today)
+
+    assert pipeline.attendance.session_id == today.id
+    assert pipeline.attendance.date == today.date
+    assert db.session.get(ClassSession, yesterday.id).status == 'closed'
+    assert Attendance.query.filter_by(
+        student_id=student, session_id=yesterday.id).one().status == 'Present'
+    assert Attendance.query.filter_by(session_id=today.id).count() == 0
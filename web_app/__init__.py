@@ -1,7 +1,10 @@
+import os
 from flask import Flask
 from web_app.extensions import db, bcrypt, login_manager
 from flask_migrate import Migrate
 from web_app.config import Config
+from web_app.database import configure_sqlite
+from web_app.metrics import init_metrics
 
 
 def create_app():
@@ -10,25 +13,36 @@ def create_app():
 
     # Initialize extensions
     db.init_app(app)
+    configure_sqlite(app)
+    init_metrics(app)
     bcrypt.init_app(app)
     login_manager.init_app(app)
 
     # Initialize Flask-Migrate
-    Migrate(app, db)
+    Migrate(app, db, directory=os.path.join(
+        os.path.dirname(__file__), 'migrations'))
 
     # Register Blueprints
     from web_app.routes import app_routes
     app.register_blueprint(app_routes)
 
-    with app.app_context():
-        # Import models to register them with SQLAlchemy
-        from web_app import models
-        db.create_all()  # Ensure all tables are created
+    # Register CLI commands
+    from web_app.commands import offline_attendance, rebuild_attendance_summary, recognition_worker, reembed_images, unenroll_student
+    app.cli.add_command(offline_attendance)
+    app.cli.add_command(rebuild_attendance_summary)
+    app.cli.add_command(reembed_images)
+    app.cli.add_command(unenroll_student)
+    app.cli.add_command(recognition_worker)
+
+    # Import models to register them with SQLAlchemy. The schema itself is
+    # managed by the migrations: run `flask db upgrade` after deploying.
+    from web_app import models
 
     return app
 
 
 @login_manager.user_loader
 def load_user(user_id):
-    from web_app.models import User
-    return User.query.get(int(user_id))
+    # A cached, immutable snapshot rather than a query per request
+    from web_app.identity import load_identity
+    return load_identity(int(user_id))
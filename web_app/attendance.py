@@ -0,0 +1,209 @@
+import os
+from datetime import date as date_type, datetime
+
+from sqlalchemy import bindparam, case, func, or_
+
+from web_app.cache import invalidate_attendance
+from web_app.config import Config
+from web_app.extensions import db
+from web_app.models import Attendance, AttendanceSummary, ClassSession, enrollment_table
+
+
+def open_class_session(course_id, date=None, classroom_id=None):
+    """Get or create the course's ClassSession for a day and mark it active."""
+    date = date or date_type.today()
+    session = ClassSession.query.filter_by(course_id=course_id, date=date).first()
+    if session is None:
+        session = ClassSession(course_id=course_id, date=date)
+        db.session.add(session)
+    session.classroom_id = classroom_id or session.classroom_id
+    session.status = 'active'
+    session.end_time = None
+    db.session.commit()
+    return session
+
+
+def roster_ids(course_id):
+    return [row.user_id for row in db.session.query(
+        enrollment_table.c.user_id).filter(
+        enrollment_table.c.course_id == course_id)]
+
+
+def _upsert_statement(dialect):
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return None
+
+    table = Attendance.__table__
+    statement = insert(table)
+    # A student seen in any run for the day stays Present
+    return statement.on_conflict_do_update(
+        index_elements=[table.c.student_id, table.c.course_id, table.c.date],
+        set_={'status': case((statement.excluded.status == 'Present', 'Present'),
+                             else_=table.c.status),
+              'session_id': func.coalesce(statement.excluded.session_id,
+                                          table.c.session_id)})
+
+
+def _merge_rows(rows, existing):
+    """Portable fallback for databases without INSERT ... ON CONFLICT."""
+    table = Attendance.__table__
+    first = rows[0]
+    new_rows = [row for row in rows if row['student_id'] not in existing]
+    promoted = [row['student_id'] for row in rows
+                if row['status'] == 'Present' and existing.get(row['student_id']) == 'Absent']
+    if new_rows:
+        db.session.execute(table.insert(), new_rows)
+    if promoted:
+        db.session.execute(table.update().where(
+            table.c.course_id == first['course_id'], table.c.date == first['date'],
+            table.c.student_id.in_(promoted)).values(status='Present'))
+
+
+def _update_summary(course_id, date, rows, existing):
+    """Apply one session's rows to the per-student AttendanceSummary totals."""
+    deltas = []
+    for row in rows:
+        before = existing.get(row['student_id'])
+        attended = row['status'] == 'Present' and before != 'Present'
+        held = before is None
+        if held or attended:
+            deltas.append({'c_id': course_id, 's_id': row['student_id'],
+                           'held': int(held), 'attended': int(attended),
+                           'attended_on': date if attended else None})
+    if not deltas:
+        return
+
+    summary = AttendanceSummary.__table__
+    known = {row.student_id for row in db.session.execute(
+        db.select(summary.c.student_id).where(
+            summary.c.course_id == course_id,
+            summary.c.student_id.in_([d['s_id'] for d in deltas])))}
+    missing = [{'course_id': course_id, 'student_id': d['s_id'],
+                'sessions_held': 0, 'sessions_attended': 0}
+               for d in deltas if d['s_id'] not in known]
+    if missing:
+        db.session.execute(summary.insert(), missing)
+
+    attended_on = bindparam('attended_on', type_=db.Date)
+    db.session.execute(summary.update().where(
+        summary.c.course_id == bindparam('c_id'),
+        summary.c.student_id == bindparam('s_id')
+    ).values(
+        sessions_held=summary.c.sessions_held + bindparam('held'),
+        sessions_attended=summary.c.sessions_attended + bindparam('attended'),
+        last_attended=case(
+            (attended_on.is_(None), summary.c.last_attended),
+            (or_(summary.c.last_attended.is_(None),
+                 summary.c.last_attended < attended_on), attended_on),
+            else_=summary.c.last_attended)
+    ), deltas)
+
+
+def write_attendance(course_id, present, date=None, session_id=None):
+    """Write Present/Absent rows for a course's whole roster in one transaction.
+
+    Rows are unique per (student, course, date), so writing the same day
+    again only upgrades Absent to Present and never duplicates rows. The
+    AttendanceSummary totals are updated, and the ClassSession (if given)
+    is closed, in the same transaction, and cached dashboards and reports
+    showing the course are invalidated once it commits.
+    Returns the number of roster rows written.
+    """
+    date = date or date_type.today()
+    if session_id is not None:
+        db.session.execute(ClassSession.__table__.update().where(
+            ClassSession.id == session_id).values(
+            status='closed', end_time=datetime.now()))
+
+    rows = [{'student_id': student_id, 'course_id': course_id, 'date': date,
+             'status': 'Present' if student_id in present else 'Absent',
+             'session_id': session_id}
+            for student_id in roster_ids(course_id)]
+    if not rows:
+        db.session.commit()
+        invalidate_attendance(course_id, [])
+        return 0
+
+    table = Attendance.__table__
+    existing = {row.student_id: row.status for row in db.session.execute(
+        db.select(table.c.student_id, table.c.status).where(
+            table.c.course_id == course_id, table.c.date == date))}
+
+    statement = _upsert_statement(db.session.get_bind().dialect.name)
+    if statement is not None:
+        db.session.execute(statement, rows)
+    else:
+        _merge_rows(rows, existing)
+    _update_summary(course_id, date, rows, existing)
+    db.session.commit()
+    invalidate_attendance(course_id, [row['student_id'] for row in rows])
+    return len(rows)
+
+
+def rebuild_summary(course_id=None):
+    """Recompute AttendanceSummary from the attendance history (for backfills)."""
+    summary = AttendanceSummary.__table__
+    present = Attendance.status == 'Present'
+    totals = db.select(
+        Attendance.course_id, Attendance.student_id,
+        func.count(Attendance.id),
+        func.coalesce(func.sum(case((present, 1), else_=0)), 0),
+        func.max(case((present, Attendance.date)))
+    ).group_by(Attendance.course_id, Attendance.student_id)
+
+    delete = summary.delete()
+    if course_id is not None:
+        totals = totals.where(Attendance.course_id == course_id)
+        delete = delete.where(summary.c.course_id == course_id)
+
+    db.session.execute(delete)
+    result = db.session.execute(summary.insert().from_select(
+        ['course_id', 'student_id', 'sessions_held', 'sessions_attended',
+         'last_attended'], totals))
+    db.session.commit()
+    # Rare and possibly campus-wide: drop every cached page
+    invalidate_attendance(course_id)
+    return result.rowcount
+
+
+class AttendanceAccumulator:
+    """Collects the students recognized during a session until it ends.
+
+    Nothing touches the database while the session runs. If
+    Config.ATTENDANCE_JOURNAL_DIR is set, each newly recognized student is
+    also appended to a small journal file, so a restarted server can pick
+    up a session's results; the journal is removed once committed.
+    """
+
+    def __init__(self, course_id, date=None, journal_dir=None, session_id=None):
+        self.course_id = course_id
+        self.date = date or date_type.today()
+        self.session_id = session_id
+        self.present = set()
+
+        journal_dir = journal_dir or Config.ATTENDANCE_JOURNAL_DIR
+        self.journal_path = os.path.join(
+            journal_dir, f'course-{course_id}-{self.date.isoformat()}.journal'
+        ) if journal_dir else None
+        if self.journal_path and os.path.exists(self.journal_path):
+            with open(self.journal_path) as journal:
+                self.present.update(int(line) for line in journal if line.strip())
+
+    def mark_present(self, student_id):
+        if student_id in self.present:
+            return
+        self.present.add(student_id)
+        if self.journal_path:
+            with open(self.journal_path, 'a') as journal:
+                journal.write(f'{student_id}\n')
+
+    def commit(self):
+        written = write_attendance(
+            self.course_id, self.present, self.date, self.session_id)
+        if self.journal_path and os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        return written
@@ -0,0 +1,223 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from flask import current_app
+
+from web_app.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """In-process cache: least recently used entries go first, and every
+    entry expires ``ttl`` seconds after it was stored."""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        self.set_many({key: value}, ttl)
+
+    def set_many(self, items, ttl=None):
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            for key, value in items.items():
+                self._entries[key] = (expires, value)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteCache:
+    """Cache shared by every process on the host through a SQLite file.
+
+    Web workers and the recognition worker see the same entries, so an
+    attendance commit in any process invalidates pages cached by all.
+    Values must be JSON-serialisable.
+    """
+
+    def __init__(self, path, max_entries, ttl):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS cache ('
+                         'key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_cache_expires ON cache (expires)')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Wait briefly for a lock: past that, querying the database is
+            # quicker than waiting for the cache
+            conn = sqlite3.connect(self.path, timeout=0.25, isolation_level=None)
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._connect().execute(
+            'SELECT value FROM cache WHERE key = ? AND expires >= ?',
+            (key, time.time())).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value, ttl=None):
+        self.set_many({key: value}, ttl)
+
+    def set_many(self, items, ttl=None):
+        conn = self._connect()
+        now = time.time()
+        expires = now + (self.ttl if ttl is None else ttl)
+        conn.executemany('INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)',
+                         [(key, json.dumps(value), expires) for key, value in items.items()])
+        # Entries expire in insertion order, so trimming the soonest to
+        # expire approximates LRU
+        conn.execute('DELETE FROM cache WHERE expires < ? OR key IN ('
+                     'SELECT key FROM cache ORDER BY expires DESC LIMIT -1 OFFSET ?)',
+                     (now, self.max_entries))
+
+    def delete_many(self, keys):
+        self._connect().executemany('DELETE FROM cache WHERE key = ?',
+                                    [(key,) for key in keys])
+
+    def clear(self):
+        self._connect().execute('DELETE FROM cache')
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """The configured response cache (Config.CACHE_BACKEND), or None if off.
+
+    The shared SQLite file defaults to the app's instance folder, so each
+    deployment (and no other local user) has its own.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None and Config.CACHE_BACKEND != 'none':
+            if Config.CACHE_BACKEND == 'sqlite':
+                path = Config.CACHE_PATH or os.path.join(
+                    current_app.instance_path, 'attendance-cache.db')
+                os.makedirs(os.path.dirname(path) or '.', mode=0o700, exist_ok=True)
+                _cache = SQLiteCache(path, Config.CACHE_MAX_ENTRIES, Config.CACHE_TTL)
+            else:
+                _cache = LRUCache(Config.CACHE_MAX_ENTRIES, Config.CACHE_TTL)
+        return _cache
+
+
+# Invalidation writes a new generation for each key it covers (ALL_PAGES
+# for every key) rather than only deleting entries. Each entry records the
+# generations current when its computation began and is ignored once they
+# change, so a page computed from data read before a commit, but stored
+# after the commit invalidated it, is never served.
+ALL_PAGES = '*'
+
+
+def _generation_key(key):
+    return f'generation:{key}'
+
+
+def _generations(cache, key):
+    return [cache.get(_generation_key(ALL_PAGES)), cache.get(_generation_key(key))]
+
+
+def _bump_generations(cache, keys):
+    # Outlive the entries computed before the bump; generations are never
+    # reused, so an expired one cannot validate an old entry again
+    cache.set_many({_generation_key(key): uuid.uuid4().hex for key in keys},
+                   ttl=2 * cache.ttl)
+
+
+def dashboard_key(student_id):
+    return f'student_dashboard:{student_id}'
+
+
+def report_key(course_id):
+    return f'course_report:{course_id}'
+
+
+def cached(key, compute):
+    """Return (value, etag) for ``key``, computing and storing it on a miss.
+
+    The ETag hashes the key with the value, so two users with identical
+    numbers never share one. A computed None is returned but not cached.
+    A cache that fails (e.g. a locked SQLite file) counts as a miss, so
+    pages are still served from the database.
+    """
+    cache = entry = generations = None
+    try:
+        cache = get_cache()
+        if cache is not None:
+            generations = _generations(cache, key)
+            entry = cache.get(key)
+    except Exception:
+        logger.exception('Reading %s from the cache failed', key)
+        cache = None
+    if entry is not None and entry.get('generations') != generations:
+        entry = None
+    if entry is None:
+        value = compute()
+        etag = hashlib.sha1((key + json.dumps(value, sort_keys=True)).encode()).hexdigest()
+        entry = {'value': value, 'etag': etag, 'generations': generations}
+        if cache is not None and value is not None:
+            try:
+                cache.set(key, entry)
+            except Exception:
+                logger.exception('Storing %s in the cache failed', key)
+    return entry['value'], entry['etag']
+
+
+def invalidate_attendance(course_id, student_ids=None):
+    """Invalidate cached pages showing a course's attendance after it changes.
+
+    ``student_ids`` are the students whose dashboards include the course;
+    with None, every cached page is invalidated. The attendance is already
+    committed, so a cache failure is logged rather than raised.
+    """
+    try:
+        cache = get_cache()
+        if cache is None:
+            return
+        if student_ids is None:
+            _bump_generations(cache, [ALL_PAGES])
+        else:
+            keys = [report_key(course_id)] + [dashboard_key(s) for s in student_ids]
+            _bump_generations(cache, keys)
+            cache.delete_many(keys)
+    except Exception:
+        logger.exception('Invalidating cached pages of course %s failed', course_id)
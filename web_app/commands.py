@@ -0,0 +1,78 @@
+from datetime import date as date_type
+
+import click
+from flask.cli import with_appcontext
+
+
+@click.command('offline-attendance')
+@click.argument('course_id', type=int)
+@click.argument('source', type=click.Path(exists=True))
+@click.option('--date', 'lecture_date', help='Lecture date (YYYY-MM-DD); defaults to today.')
+@with_appcontext
+def offline_attendance(course_id, source, lecture_date):
+    """Take attendance for COURSE_ID from a lecture video or image folder."""
+    from web_app.faceDetection.offline import run_offline_attendance
+
+    if lecture_date:
+        lecture_date = date_type.fromisoformat(lecture_date)
+    recognized = run_offline_attendance(course_id, source, lecture_date)
+    click.echo(f'{len(recognized)} student(s) marked present for course {course_id}.')
+
+
+@click.command('rebuild-attendance-summary')
+@click.option('--course-id', type=int, help='Only rebuild this course.')
+@with_appcontext
+def rebuild_attendance_summary(course_id):
+    """Recompute the per-student attendance summary from attendance history."""
+    from web_app.attendance import rebuild_summary
+
+    rows = rebuild_summary(course_id)
+    click.echo(f'Rebuilt {rows} attendance summary row(s).')
+
+
+@click.command('reembed-images')
+@with_appcontext
+def reembed_images():
+    """Re-embed enrolled images computed by a different face model."""
+    from web_app.config import Config
+    from web_app.faceDetection.embedding import FaceModelError
+    from web_app.faceDetection.enrollment import reembed_images as reembed
+
+    try:
+        count = reembed(Config.UPLOAD_FOLDER)
+    except FaceModelError as e:
+        raise click.ClickException(str(e))
+    click.echo(f'Re-embedded {count} image(s).')
+
+
+@click.command('unenroll-student')
+@click.argument('user_id', type=int)
+@with_appcontext
+def unenroll_student(user_id):
+    """Stop recognizing a departed student (USER_ID) in every session."""
+    from web_app.extensions import db
+    from web_app.models import User
+    from web_app.faceDetection.enrollment import unenroll_student as unenroll
+
+    user = db.session.get(User, user_id)
+    if user is None:
+        raise click.ClickException(f'No user with id {user_id}.')
+    count = unenroll(user)
+    click.echo(f'Withdrew {count} image(s) of {user.name}.')
+
+
+@click.command('recognition-worker')
+@click.option('--host', help='Status API address (default RECOGNITION_WORKER_HOST).')
+@click.option('--port', type=int, help='Status API port (default RECOGNITION_WORKER_PORT).')
+@with_appcontext
+def recognition_worker(host, port):
+    """Run queued recognition sessions and serve their status."""
+    from flask import current_app
+    from web_app.faceDetection.worker import RecognitionWorker
+
+    worker = RecognitionWorker(current_app._get_current_object(), host, port)
+    click.echo(f'Recognition worker listening on {worker.address[0]}:{worker.address[1]}')
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        worker.stop()
@@ -0,0 +1,30 @@
+from sqlalchemy import event
+
+from web_app.extensions import db
+
+
+def configure_sqlite(app):
+    """Turn on WAL and a busy timeout for every new SQLite connection.
+
+    With WAL, dashboard and report reads keep working while a session writes
+    its attendance, and concurrent writers queue on the busy timeout instead
+    of failing with "database is locked". Other databases are left alone.
+    """
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return
+
+    busy_timeout_ms = int(app.config['SQLITE_BUSY_TIMEOUT'] * 1000)
+    # WAL needs a database file; in-memory databases ignore it
+    use_wal = app.config['SQLITE_WAL'] and engine.url.database not in (None, '', ':memory:')
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f'PRAGMA busy_timeout = {busy_timeout_ms}')
+        if use_wal:
+            cursor.execute('PRAGMA journal_mode = WAL')
+            # Durable at checkpoints; safe with WAL and avoids an fsync per commit
+            cursor.execute('PRAGMA synchronous = NORMAL')
+        cursor.close()
@@ -0,0 +1,63 @@
+import csv
+import io
+import json
+
+from web_app.extensions import db
+from web_app.models import Attendance, Course, User
+
+EXPORT_COLUMNS = ['date', 'course_id', 'course_name', 'student_id',
+                  'student_name', 'enrollment_number', 'status']
+
+# Rows fetched per round trip from the server-side cursor
+EXPORT_BATCH_SIZE = 1000
+
+
+def attendance_rows(course_ids, date_from=None, date_to=None):
+    """Stream attendance rows for the given courses, in course/date order."""
+    query = db.select(
+        Attendance.date, Course.id, Course.name, User.id, User.name,
+        User.enrollment_number, Attendance.status
+    ).join(
+        Course, Course.id == Attendance.course_id
+    ).join(
+        User, User.id == Attendance.student_id
+    ).where(Attendance.course_id.in_(course_ids))
+    if date_from is not None:
+        query = query.where(Attendance.date >= date_from)
+    if date_to is not None:
+        query = query.where(Attendance.date <= date_to)
+    query = query.order_by(Attendance.course_id, Attendance.date,
+                           Attendance.student_id)
+
+    # yield_per streams results instead of loading the whole export
+    result = db.session.execute(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    for partition in result.partitions():
+        yield from partition
+
+
+def stream_csv(rows):
+    """Yield CSV text in chunks of EXPORT_BATCH_SIZE rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for count, row in enumerate(rows, 1):
+        writer.writerow([row[0].isoformat()] + list(row[1:]))
+        if count % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def stream_ndjson(rows):
+    """Yield one JSON object per line, in chunks of EXPORT_BATCH_SIZE rows."""
+    lines = []
+    for row in rows:
+        record = dict(zip(EXPORT_COLUMNS, row))
+        record['date'] = record['date'].isoformat()
+        lines.append(json.dumps(record))
+        if len(lines) == EXPORT_BATCH_SIZE:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
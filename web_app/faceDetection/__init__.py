@@ -0,0 +1 @@
+# Face detection, embedding and recognition for classroom attendance sessions.
@@ -0,0 +1,291 @@
+import threading
+from collections import namedtuple
+from datetime import timedelta
+
+import numpy as np
+from sqlalchemy import func
+
+from web_app.config import Config
+from web_app.extensions import db
+from web_app.models import Image
+from web_app.faceDetection.gallery import FaceGallery
+from web_app.faceDetection.matcher import FaceMatcher, Match, assign_matches
+
+# Rows scored per chunk while clustering, to bound the temporary matrix
+_CHUNK_ROWS = 16384
+# Re-read Image rows changed this long before the last change seen, so a
+# transaction that committed late is still picked up
+_SYNC_OVERLAP = timedelta(seconds=60)
+
+# Bucket centroids (None until there is a row to train on), per-list
+# vectors and owning user ids, user id -> ids of the lists holding that
+# user's rows, and the number of rows the centroids were trained on
+_IVFLists = namedtuple('_IVFLists', ['centroids', 'vectors', 'owners', 'lists_of_user',
+                                     'trained_rows'])
+_UNTRAINED = _IVFLists(None, (), (), {}, 0)
+
+
+def _nearest_centroids(embeddings, centroids):
+    assignment = np.empty(len(embeddings), dtype=np.int64)
+    for start in range(0, len(embeddings), _CHUNK_ROWS):
+        chunk = embeddings[start:start + _CHUNK_ROWS]
+        assignment[start:start + _CHUNK_ROWS] = np.argmax(
+            chunk @ centroids.T, axis=1)
+    return assignment
+
+
+def train_centroids(embeddings, nlist, iterations=10, sample_size=None, seed=0):
+    """Spherical k-means over (a sample of) the gallery."""
+    rng = np.random.default_rng(seed)
+    sample_size = sample_size or nlist * 64
+    if len(embeddings) > sample_size:
+        embeddings = embeddings[rng.choice(len(embeddings), sample_size, replace=False)]
+    nlist = min(nlist, len(embeddings))
+
+    centroids = embeddings[rng.choice(len(embeddings), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = _nearest_centroids(embeddings, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, embeddings)
+        counts = np.bincount(assignment, minlength=nlist)
+        # Re-seed empty clusters from random rows
+        empty = counts == 0
+        sums[empty] = embeddings[rng.choice(len(embeddings), int(empty.sum()))]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = sums / np.maximum(norms, 1e-12)
+    return centroids.astype(np.float32)
+
+
+class IVFIndex:
+    """Inverted-file approximate index over gallery embeddings.
+
+    Embeddings are bucketed by their nearest k-means centroid. A query only
+    scores the rows in its ``nprobe`` closest buckets, so raising nprobe
+    trades latency for recall (nprobe == nlist is an exact search).
+    Students can be replaced and removed without retraining; each change
+    builds new lists and swaps them in with one assignment, so a concurrent
+    match never sees a half-applied change. An index built on an empty or
+    small gallery is trained on the first rows it gets, and retrained
+    whenever the gallery grows past Config.FACE_INDEX_RETRAIN_GROWTH times
+    the rows it was trained on, so buckets stay small as enrollment grows.
+    """
+
+    def __init__(self, nlist=None, nprobe=None, threshold=None, top_k=None):
+        # None picks ~4*sqrt(gallery size) at each training
+        self.nlist_setting = nlist or Config.FACE_INDEX_NLIST or None
+        self.nprobe = Config.FACE_INDEX_NPROBE if nprobe is None else nprobe
+        self.threshold = Config.FACE_MATCH_THRESHOLD if threshold is None else threshold
+        self.top_k = Config.FACE_MATCH_TOP_K if top_k is None else top_k
+        self._lists = _UNTRAINED
+        self._write_lock = threading.Lock()
+
+    @classmethod
+    def from_gallery(cls, gallery, nlist=None, nprobe=None, threshold=None,
+                     top_k=None):
+        index = cls(nlist, nprobe, threshold, top_k)
+        if len(gallery):
+            index._lists = index._trained(gallery.user_ids, gallery.embeddings)
+        return index
+
+    def __len__(self):
+        return len(self._lists.lists_of_user)
+
+    @property
+    def centroids(self):
+        return self._lists.centroids
+
+    @property
+    def nlist(self):
+        centroids = self._lists.centroids
+        return 0 if centroids is None else len(centroids)
+
+    def _trained(self, user_ids, embeddings):
+        nlist = self.nlist_setting or max(1, int(4 * np.sqrt(len(embeddings))))
+        centroids = train_centroids(embeddings, nlist)
+        dim = centroids.shape[1]
+        empty = _IVFLists(
+            centroids,
+            tuple(np.empty((0, dim), dtype=np.float32) for _ in range(len(centroids))),
+            tuple(np.empty(0, dtype=np.int64) for _ in range(len(centroids))),
+            {}, len(embeddings))
+        return self._with_rows(empty, user_ids, embeddings)
+
+    @staticmethod
+    def _with_rows(lists, user_ids, embeddings):
+        vectors, owners = list(lists.vectors), list(lists.owners)
+        lists_of_user = dict(lists.lists_of_user)
+        assignment = _nearest_centroids(embeddings, lists.centroids)
+        order = np.argsort(assignment, kind='stable')
+        list_ids, starts = np.unique(assignment[order], return_index=True)
+        for list_id, rows in zip(list_ids, np.split(order, starts[1:])):
+            vectors[list_id] = np.vstack([vectors[list_id], embeddings[rows]])
+            owners[list_id] = np.concatenate([owners[list_id], user_ids[rows]])
+            for user_id in np.unique(user_ids[rows]):
+                user_id = int(user_id)
+                lists_of_user[user_id] = lists_of_user.get(
+                    user_id, frozenset()) | {int(list_id)}
+        return lists._replace(vectors=tuple(vectors), owners=tuple(owners),
+                              lists_of_user=lists_of_user)
+
+    @staticmethod
+    def _without_users(lists, user_ids):
+        user_ids = [u for u in user_ids if u in lists.lists_of_user]
+        if not user_ids:
+            return lists
+        vectors, owners = list(lists.vectors), list(lists.owners)
+        lists_of_user = dict(lists.lists_of_user)
+        touched = set().union(*(lists_of_user.pop(u) for u in user_ids))
+        for list_id in touched:
+            keep = ~np.isin(owners[list_id], user_ids)
+            vectors[list_id] = vectors[list_id][keep]
+            owners[list_id] = owners[list_id][keep]
+        return lists._replace(vectors=tuple(vectors), owners=tuple(owners),
+                              lists_of_user=lists_of_user)
+
+    def replace(self, user_id, embeddings, image_ids=None):
+        """Set a student's embeddings; none removes the student."""
+        self.replace_many({user_id: (embeddings, image_ids)})
+
+    def replace_many(self, changes):
+        """Set the embeddings of several students in one swap.
+
+        ``changes`` maps user id -> (embeddings, image ids or None); empty
+        embeddings remove the student.
+        """
+        added_ids, added = [], []
+        for user_id, (embeddings, _) in changes.items():
+            if len(embeddings):
+                embeddings = np.asarray(embeddings, dtype=np.float32).reshape(
+                    len(embeddings), -1)
+                added.append(embeddings)
+                added_ids.append(np.full(len(embeddings), user_id, dtype=np.int64))
+
+        with self._write_lock:
+            lists = self._without_users(self._lists, list(changes))
+            if added:
+                user_ids, embeddings = np.concatenate(added_ids), np.vstack(added)
+                rows = sum(len(owners) for owners in lists.owners) + len(user_ids)
+                if (lists.centroids is None or
+                        rows > Config.FACE_INDEX_RETRAIN_GROWTH * lists.trained_rows):
+                    if lists.centroids is not None:
+                        user_ids = np.concatenate([*lists.owners, user_ids])
+                        embeddings = np.vstack([*lists.vectors, embeddings])
+                    lists = self._trained(user_ids, embeddings)
+                else:
+                    lists = self._with_rows(lists, user_ids, embeddings)
+            self._lists = lists
+
+    def remove(self, user_id):
+        self.replace(user_id, [])
+
+    def match(self, queries, top_k=None, threshold=None):
+        """Return, for each face, up to top_k Matches above the threshold."""
+        top_k = self.top_k if top_k is None else top_k
+        threshold = self.threshold if threshold is None else threshold
+        lists = self._lists
+        if len(lists.lists_of_user) == 0:
+            return [[] for _ in range(len(queries))]
+
+        centroids = lists.centroids
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, centroids.shape[1])
+        nprobe = min(self.nprobe, len(centroids))
+        probes = np.argpartition(-(queries @ centroids.T),
+                                 nprobe - 1, axis=1)[:, :nprobe]
+
+        results = []
+        for query, probed in zip(queries, probes):
+            vectors = np.concatenate([lists.vectors[i] for i in probed])
+            owners = np.concatenate([lists.owners[i] for i in probed])
+            scores = vectors @ query
+            # Several rows can belong to one student, so keep a few spares
+            # to fill top_k distinct students
+            keep = min(len(scores), top_k * 8)
+            best = np.argpartition(-scores, keep - 1)[:keep] if keep else []
+            best = sorted(best, key=lambda row: -scores[row])
+
+            matches, seen = [], set()
+            for row in best:
+                if scores[row] < threshold or len(matches) == top_k:
+                    break
+                user_id = int(owners[row])
+                if user_id not in seen:
+                    seen.add(user_id)
+                    matches.append(Match(user_id, float(scores[row])))
+            results.append(matches)
+        return results
+
+    def assign(self, queries, threshold=None):
+        return assign_matches(self.match(queries, threshold=threshold))
+
+
+def build_index(gallery, kind=None, **kwargs):
+    """Build the gallery index selected by Config.FACE_INDEX ('exact' or 'ivf')."""
+    kind = kind or Config.FACE_INDEX
+    if kind == 'ivf':
+        # Built even on an empty gallery: it trains on the first enrollments
+        return IVFIndex.from_gallery(gallery, **kwargs)
+    if kind not in ('exact', 'ivf'):
+        raise ValueError(f'Unknown face index: {kind}')
+    return FaceMatcher(gallery, kwargs.get('threshold'), kwargs.get('top_k'))
+
+
+# Campus-wide index, built on first use and then kept in sync with the Image
+# table by sync_global_index
+_global_index = None
+_global_index_lock = threading.Lock()
+# Latest Image.updated_at applied, and the rows applied near it
+_synced_until = None
+_synced_images = {}
+
+
+def get_global_index():
+    global _global_index, _synced_until
+    with _global_index_lock:
+        if _global_index is None:
+            # Read the watermark first: rows changed while loading are
+            # applied again by the next sync, which is harmless
+            _synced_until = db.session.scalar(db.select(func.max(Image.updated_at)))
+            if _synced_until is not None:
+                _synced_images.update(db.session.query(Image.id, Image.updated_at).filter(
+                    Image.updated_at >= _synced_until - _SYNC_OVERLAP).all())
+            _global_index = build_index(FaceGallery.load())
+        return _global_index
+
+
+def sync_global_index():
+    """Apply embeddings added, recomputed or dropped since the last sync.
+
+    Registrations, `flask reembed-images` and `flask unenroll-student` may
+    run in any process; they only change Image rows, and the recognition
+    worker calls this on every poll. Returns the number of students updated.
+    """
+    global _synced_until
+    with _global_index_lock:
+        if _global_index is None:
+            return 0
+        query = db.session.query(Image.id, Image.user_id, Image.updated_at)
+        if _synced_until is not None:
+            query = query.filter(Image.updated_at >= _synced_until - _SYNC_OVERLAP)
+
+        changed = set()
+        for image_id, user_id, updated_at in query:
+            if updated_at is None or _synced_images.get(image_id) == updated_at:
+                continue
+            _synced_images[image_id] = updated_at
+            changed.add(user_id)
+            if _synced_until is None or updated_at > _synced_until:
+                _synced_until = updated_at
+        if _synced_until is not None:
+            cutoff = _synced_until - _SYNC_OVERLAP
+            for image_id in [i for i, t in _synced_images.items() if t < cutoff]:
+                del _synced_images[image_id]
+
+        if changed:
+            # One rebuild for the whole batch rather than one per student
+            gallery = FaceGallery.load(changed)
+            changes = {}
+            for user_id in changed:
+                rows = gallery.user_ids == user_id
+                changes[user_id] = (gallery.embeddings[rows], gallery.image_ids[rows])
+            _global_index.replace_many(changes)
+        return len(changed)
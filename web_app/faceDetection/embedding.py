@@ -0,0 +1,156 @@
+import os
+
+import cv2
+import numpy as np
+
+from web_app.config import Config
+
+# Aligned face crops are FACE_SIZE x FACE_SIZE pixels, which is also the
+# input size the SFace model (Config.FACE_EMBEDDING_MODEL) expects.
+FACE_SIZE = 112
+# Extra context kept around the MTCNN box when cropping
+FACE_MARGIN = 1.2
+
+_detector = None
+_recognizer = None
+
+
+class FaceModelError(Exception):
+    pass
+
+
+def get_detector():
+    global _detector
+    if _detector is None:
+        from mtcnn import MTCNN
+        _detector = MTCNN()
+    return _detector
+
+
+def model_name():
+    """Name stored with every embedding: the configured model's file name.
+
+    Embeddings are only comparable with others from the same model, so the
+    gallery loads just the rows whose name matches.
+    """
+    path = Config.FACE_EMBEDDING_MODEL
+    return os.path.basename(path) if path else None
+
+
+def require_face_model():
+    """Raise FaceModelError unless the face embedding model is available."""
+    path = Config.FACE_EMBEDDING_MODEL
+    if not path:
+        raise FaceModelError(
+            'FACE_EMBEDDING_MODEL is not set; download the SFace model (see README).')
+    if not os.path.isfile(path):
+        raise FaceModelError(f'Face embedding model not found: {path}')
+
+
+def _get_recognizer():
+    global _recognizer
+    if _recognizer is None:
+        require_face_model()
+        _recognizer = cv2.FaceRecognizerSF.create(
+            Config.FACE_EMBEDDING_MODEL, '')
+    return _recognizer
+
+
+def load_image(path):
+    """Read an image file as RGB, the channel order MTCNN works on."""
+    bgr = cv2.imread(path)
+    if bgr is None:
+        return None
+    return cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+
+
+def detect_faces(rgb):
+    detections = get_detector().detect_faces(rgb)
+    return [d for d in detections if d['confidence'] >= Config.MIN_FACE_CONFIDENCE]
+
+
+def align_face(rgb, detection):
+    """Rotate the face so the eyes are level and crop it to FACE_SIZE."""
+    x, y, w, h = detection['box']
+    left_eye = detection['keypoints']['left_eye']
+    right_eye = detection['keypoints']['right_eye']
+    angle = np.degrees(np.arctan2(right_eye[1] - left_eye[1],
+                                  right_eye[0] - left_eye[0]))
+
+    center_x, center_y = x + w / 2.0, y + h / 2.0
+    scale = FACE_SIZE / (max(w, h) * FACE_MARGIN)
+    matrix = cv2.getRotationMatrix2D((center_x, center_y), angle, scale)
+    matrix[0, 2] += FACE_SIZE / 2.0 - center_x
+    matrix[1, 2] += FACE_SIZE / 2.0 - center_y
+    return cv2.warpAffine(rgb, matrix, (FACE_SIZE, FACE_SIZE),
+                          flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+
+
+def embed_face(face):
+    """Return an L2-normalised float32 embedding for an aligned face crop.
+
+    Raises FaceModelError when Config.FACE_EMBEDDING_MODEL is missing.
+    """
+    vector = _get_recognizer().feature(
+        cv2.cvtColor(face, cv2.COLOR_RGB2BGR)).ravel().astype(np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+def embed_faces(faces):
+    """Embed several aligned crops into an (n, dim) float32 matrix."""
+    if not faces:
+        return None
+    return np.stack([embed_face(face) for face in faces])
+
+
+def largest_face(detections):
+    if not detections:
+        return None
+    return max(detections, key=lambda d: d['box'][2] * d['box'][3])
+
+
+def embed_image(rgb):
+    """Embed the largest face in an image, or return None if there is none."""
+    detection = largest_face(detect_faces(rgb))
+    if detection is None:
+        return None
+    return embed_face(align_face(rgb, detection))
+
+
+def downscale(rgb, max_side):
+    """Shrink an image so its longer side is at most max_side pixels."""
+    scale = max_side / max(rgb.shape[:2])
+    if scale >= 1:
+        return rgb
+    return cv2.resize(rgb, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+
+def ingest_image(path, crop_path):
+    """Find the face in an uploaded image, save its aligned crop and embed it.
+
+    The original is downscaled before detection, and the FACE_SIZE crop is
+    written to crop_path so later re-embedding never decodes the original.
+    Returns (status, embedding), where status is "enrolled", "no_face" or
+    "unreadable". Runs in the enrollment processes, so it only takes paths.
+    """
+    rgb = load_image(path)
+    if rgb is None:
+        return 'unreadable', None
+    rgb = downscale(rgb, Config.INGEST_MAX_SIDE)
+    detection = largest_face(detect_faces(rgb))
+    if detection is None:
+        return 'no_face', None
+
+    face = align_face(rgb, detection)
+    cv2.imwrite(crop_path, cv2.cvtColor(face, cv2.COLOR_RGB2BGR),
+                [cv2.IMWRITE_JPEG_QUALITY, 95])
+    return 'enrolled', embed_face(face)
+
+
+def embed_crop(crop_path):
+    """Re-embed a face from the crop saved by ingest_image."""
+    face = load_image(crop_path)
+    if face is None:
+        return 'unreadable', None
+    return 'enrolled', embed_face(face)
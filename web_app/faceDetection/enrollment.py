@@ -0,0 +1,187 @@
+import atexit
+import multiprocessing as mp
+import os
+import threading
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from flask import current_app
+from sqlalchemy import or_
+
+from web_app.config import Config
+from web_app.extensions import db
+from web_app.jobs import claim_pending_images
+from web_app.models import Image
+from web_app.storage import crop_key
+from web_app.faceDetection.embedding import (embed_crop, ingest_image, model_name,
+                                            require_face_model)
+from web_app.faceDetection.gallery import encode_embedding
+
+# The recognition worker claims pending images in batches and fans each
+# batch out to a process pool, so decoding and MTCNN run in parallel and
+# never in a web worker
+_pool_lock = threading.Lock()
+_processes = None
+_pool_started = False
+
+
+def _get_pool():
+    global _processes, _pool_started
+    with _pool_lock:
+        if not _pool_started:
+            _pool_started = True
+            if Config.ENROLLMENT_PROCESSES > 0:
+                _processes = ProcessPoolExecutor(
+                    max_workers=Config.ENROLLMENT_PROCESSES,
+                    mp_context=mp.get_context('spawn'))
+        return _processes
+
+
+def _discard_pool(pool):
+    # A pool whose child died is broken for good; the next _get_pool()
+    # starts a new one
+    global _processes, _pool_started
+    with _pool_lock:
+        if _processes is pool:
+            _processes, _pool_started = None, False
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _run_inline(task):
+    try:
+        return task[0](*task[1:])
+    except Exception:
+        current_app.logger.exception('Could not embed %s', task[1])
+        return 'failed', None
+
+
+def _embed_all(tasks):
+    """Run embedding tasks; returns one (status, vector) per task.
+
+    A child process that dies (out of memory in MTCNN, a native crash on a
+    bad image) breaks the whole pool. The pool is then rebuilt and the
+    tasks it left unfinished run again one at a time, so the rest of the
+    batch is still embedded and only an image that kills a process on its
+    own is marked failed.
+    """
+    processes = _get_pool()
+    if processes is None:
+        return [_run_inline(task) for task in tasks]
+
+    results = [None] * len(tasks)
+    try:
+        futures = [processes.submit(*task) for task in tasks]
+    except BrokenProcessPool:
+        futures = []
+    for i, future in enumerate(futures):
+        try:
+            results[i] = future.result()
+        except BrokenProcessPool:
+            pass
+        except Exception:
+            current_app.logger.exception('Could not embed %s', tasks[i][1])
+            results[i] = 'failed', None
+
+    unfinished = [i for i, result in enumerate(results) if result is None]
+    if unfinished:
+        current_app.logger.warning('An enrollment process died; retrying %d images '
+                                   'one at a time', len(unfinished))
+        _discard_pool(processes)
+    for i in unfinished:
+        processes = _get_pool()
+        try:
+            results[i] = processes.submit(*tasks[i]).result()
+        except BrokenProcessPool:
+            current_app.logger.error('Embedding %s killed its process', tasks[i][1])
+            _discard_pool(processes)
+            results[i] = 'failed', None
+        except Exception:
+            current_app.logger.exception('Could not embed %s', tasks[i][1])
+            results[i] = 'failed', None
+    return results
+
+
+def shutdown_enrollment():
+    with _pool_lock:
+        if _processes is not None:
+            _processes.shutdown(wait=True)
+
+
+atexit.register(shutdown_enrollment)
+
+
+def enroll_pending(folder, batch_size=None):
+    """Claim a batch of pending images and embed them.
+
+    Returns the number of images claimed (0 when none are pending). Raises
+    FaceModelError, before claiming anything, when no face model is
+    configured, so the images wait for one.
+    """
+    require_face_model()
+    image_ids = claim_pending_images(batch_size or Config.ENROLLMENT_BATCH_SIZE)
+    if image_ids:
+        enroll_images(image_ids, folder)
+    return len(image_ids)
+
+
+def enroll_images(image_ids, folder):
+    """Embed the given Image rows and record each result on the row.
+
+    New uploads are ingested: the face is found in the original and its
+    aligned crop saved next to it. Images that already have a crop are
+    re-embedded from it without touching the original. Returns the number
+    of images in which a face was found. Images without a usable face keep
+    no embedding, so they can be re-processed later. Raises FaceModelError,
+    leaving the images untouched, when no face model is configured.
+    Recognition workers pick the new embeddings up from the committed rows
+    (see sync_global_index).
+    """
+    require_face_model()
+    images = Image.query.filter(Image.id.in_(image_ids)).all()
+    tasks = []
+    for image in images:
+        if image.crop_filename:
+            tasks.append((embed_crop, os.path.join(folder, image.crop_filename)))
+        else:
+            tasks.append((ingest_image, os.path.join(folder, image.filename),
+                          os.path.join(folder, crop_key(image.filename))))
+
+    vectors = []
+    for image, (status, vector) in zip(images, _embed_all(tasks)):
+        image.status = status
+        if status == 'enrolled' and not image.crop_filename:
+            image.crop_filename = crop_key(image.filename)
+        image.embedding = encode_embedding(vector) if vector is not None else None
+        image.embedding_model = model_name() if vector is not None else None
+        if vector is not None:
+            vectors.append(vector)
+
+    db.session.commit()
+    return len(vectors)
+
+
+def reembed_images(folder):
+    """Recompute enrolled images embedded by another model (or none).
+
+    Run after changing Config.FACE_EMBEDDING_MODEL; images with a saved
+    crop are re-embedded from it. Returns the number of images re-embedded.
+    """
+    require_face_model()
+    stale = [row.id for row in db.session.query(Image.id).filter(
+        Image.status == 'enrolled',
+        or_(Image.embedding_model.is_(None), Image.embedding_model != model_name()))]
+    return enroll_images(stale, folder) if stale else 0
+
+
+def unenroll_student(user):
+    """Drop a departing student's embeddings so they are no longer matched.
+
+    Recognition workers remove the student from their index on their next
+    poll. Returns the number of images withdrawn.
+    """
+    withdrawn = Image.query.filter_by(user_id=user.id).update(
+        {'embedding': None, 'embedding_model': None, 'status': 'withdrawn',
+         'updated_at': datetime.now()})
+    db.session.commit()
+    return withdrawn
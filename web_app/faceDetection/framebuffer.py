@@ -0,0 +1,92 @@
+import queue
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+# Per-slot metadata: sequence number, frame height, frame width
+_META_FIELDS = 3
+_ALIGNMENT = 64
+
+
+class FrameRing:
+    """Preallocated frame slots in shared memory, handed out through a queue.
+
+    The producer takes a free slot, writes a frame into it in place and
+    sends only ``(slot, sequence)`` to a consumer, which returns the slot
+    once it has finished reading. When no slot is free the producer drops
+    the frame, so memory use is fixed at ``slots`` frames.
+    """
+
+    def __init__(self, slots, shape, free, dtype=np.uint8, name=None):
+        self.slots = slots
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.free = free
+
+        meta_bytes = slots * _META_FIELDS * 8
+        self._offset = -(-meta_bytes // _ALIGNMENT) * _ALIGNMENT
+        size = self._offset + slots * int(np.prod(self.shape)) * self.dtype.itemsize
+        self._owner = name is None
+        self._shm = shared_memory.SharedMemory(
+            name=name, create=self._owner, size=size)
+
+        self.meta = np.ndarray((slots, _META_FIELDS), np.int64,
+                               buffer=self._shm.buf)
+        self.frames = np.ndarray((slots,) + self.shape, self.dtype,
+                                 buffer=self._shm.buf, offset=self._offset)
+
+    @classmethod
+    def create(cls, slots, shape, free, dtype=np.uint8):
+        ring = cls(slots, shape, free, dtype)
+        ring.meta[:] = -1
+        for slot in range(slots):
+            free.put(slot)
+        return ring
+
+    def __reduce__(self):
+        # Child processes attach to the same block by name
+        return (self.__class__,
+                (self.slots, self.shape, self.free, self.dtype.str, self._shm.name))
+
+    def acquire(self):
+        """Return a free slot index, or None if every slot is in use."""
+        try:
+            return self.free.get_nowait()
+        except queue.Empty:
+            return None
+
+    def write(self, slot, frame):
+        """Copy a frame that was not read straight into its slot."""
+        height, width = frame.shape[:2]
+        if height > self.shape[0] or width > self.shape[1]:
+            scale = min(self.shape[0] / height, self.shape[1] / width)
+            height, width = int(height * scale), int(width * scale)
+            cv2.resize(frame, (width, height),
+                       dst=self.frames[slot, :height, :width])
+        else:
+            self.frames[slot, :height, :width] = frame
+        return height, width
+
+    def publish(self, slot, sequence, height=None, width=None):
+        self.meta[slot] = (sequence,
+                           self.shape[0] if height is None else height,
+                           self.shape[1] if width is None else width)
+        return slot, sequence
+
+    def view(self, slot, sequence):
+        """Zero-copy view of a published frame."""
+        stored, height, width = self.meta[slot]
+        if stored != sequence:
+            raise ValueError(f'Slot {slot} holds frame {stored}, not {sequence}')
+        return self.frames[slot, :height, :width]
+
+    def release(self, slot):
+        self.free.put(slot)
+
+    def close(self):
+        # Views must go before the mapping can be closed
+        self.meta = self.frames = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
@@ -0,0 +1,75 @@
+import numpy as np
+
+from web_app.extensions import db
+from web_app.models import Image, User
+from web_app.faceDetection.embedding import model_name
+
+
+def encode_embedding(vector):
+    return np.asarray(vector, dtype='<f4').tobytes()
+
+
+def decode_embedding(blob):
+    return np.frombuffer(blob, dtype='<f4')
+
+
+class FaceGallery:
+    """Enrolled student embeddings held as one contiguous float32 matrix.
+
+    Row i of ``embeddings`` belongs to ``user_ids[i]`` and was computed from
+    the ``Image`` row ``image_ids[i]``.
+    """
+
+    def __init__(self, embeddings, user_ids, image_ids):
+        self.embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        self.user_ids = np.asarray(user_ids, dtype=np.int64)
+        self.image_ids = np.asarray(image_ids, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    @property
+    def dim(self):
+        return self.embeddings.shape[1]
+
+    @classmethod
+    def empty(cls, dim=0):
+        return cls(np.empty((0, dim), dtype=np.float32), [], [])
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build a gallery from (image_id, user_id, embedding_blob) rows."""
+        rows = list(rows)
+        if not rows:
+            return cls.empty()
+
+        if len({len(row[2]) for row in rows}) > 1:
+            raise ValueError('Gallery embeddings differ in size; they must all '
+                             'come from one model (run `flask reembed-images`).')
+        matrix = np.frombuffer(b''.join(row[2] for row in rows), dtype='<f4')
+        return cls(matrix.reshape(len(rows), -1),
+                   [row[1] for row in rows],
+                   [row[0] for row in rows])
+
+    @classmethod
+    def load(cls, user_ids=None):
+        """Load enrolled student embeddings with a single query.
+
+        Only embeddings computed by the configured model are loaded. If
+        user_ids is given only those students' embeddings are loaded.
+        """
+        name = model_name()
+        if name is None:
+            return cls.empty()
+        query = db.session.query(Image.id, Image.user_id, Image.embedding).join(
+            User, User.id == Image.user_id).filter(
+            User.role == 'student', Image.embedding.isnot(None),
+            Image.embedding_model == name)
+        if user_ids is not None:
+            query = query.filter(Image.user_id.in_(list(user_ids)))
+        return cls.from_rows(query.all())
+
+    def subset(self, mask):
+        """Return a gallery with only the rows selected by a boolean mask."""
+        return FaceGallery(self.embeddings[mask], self.user_ids[mask],
+                           self.image_ids[mask])
@@ -0,0 +1,108 @@
+import cv2
+import numpy as np
+
+from web_app.config import Config
+from web_app.faceDetection.embedding import detect_faces
+
+# Frames are compared as grayscale thumbnails of this size
+THUMB_SIZE = (64, 48)
+
+
+def thumbnail(frame):
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, THUMB_SIZE, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+
+def changed_cells(thumb, previous, grid, threshold):
+    """Boolean (grid, grid) mask of cells whose mean difference reaches threshold."""
+    cell_h, cell_w = THUMB_SIZE[1] // grid, THUMB_SIZE[0] // grid
+    diff = np.abs(thumb[:cell_h * grid, :cell_w * grid] -
+                  previous[:cell_h * grid, :cell_w * grid])
+    return diff.reshape(grid, cell_h, grid, cell_w).mean(axis=(1, 3)) >= threshold
+
+
+class MotionGate:
+    """Decides which parts of a frame need MTCNN.
+
+    Each frame is compared with the last frame that was sent for detection.
+    Static frames are skipped; otherwise the changed cells are grouped into
+    regions (grown by one cell of margin) and only those are detected on.
+    Every ``refresh_every`` frames the whole frame is detected regardless.
+    """
+
+    def __init__(self, grid=None, threshold=None, refresh_every=None,
+                 full_frame_ratio=0.5):
+        self.grid = grid or Config.GATE_GRID
+        self.threshold = Config.GATE_THRESHOLD if threshold is None else threshold
+        self.refresh_every = refresh_every or Config.GATE_REFRESH_FRAMES
+        self.full_frame_ratio = full_frame_ratio
+        self.frames_seen = 0
+        self.frames_skipped = 0
+        self._reference = None
+        self._since_refresh = 0
+
+    @property
+    def skip_ratio(self):
+        return self.frames_skipped / self.frames_seen if self.frames_seen else 0.0
+
+    def check(self, frame):
+        """Return None to skip the frame, [] for a full-frame pass, or a
+        list of (x, y, w, h) regions to detect on."""
+        self.frames_seen += 1
+        self._since_refresh += 1
+        thumb = thumbnail(frame)
+
+        if self._reference is None or self._since_refresh >= self.refresh_every:
+            self._reference = thumb
+            self._since_refresh = 0
+            return []
+
+        mask = changed_cells(thumb, self._reference, self.grid, self.threshold)
+        if not mask.any():
+            self.frames_skipped += 1
+            return None
+
+        self._reference = thumb
+        if mask.mean() >= self.full_frame_ratio:
+            return []
+
+        # Grow by one cell so faces on a cell border are not cut in half
+        mask = cv2.dilate(mask.astype(np.uint8), np.ones((3, 3), np.uint8))
+        count, _, cells, _ = cv2.connectedComponentsWithStats(mask)
+        frame_h, frame_w = frame.shape[:2]
+        scale_x, scale_y = frame_w / self.grid, frame_h / self.grid
+        regions = []
+        for x, y, w, h, _ in cells[1:count]:
+            regions.append((int(x * scale_x), int(y * scale_y),
+                            int(w * scale_x), int(h * scale_y)))
+        return regions
+
+
+def detect_in_regions(rgb, regions):
+    """Run MTCNN on the given regions only (the whole frame if empty)."""
+    if not regions:
+        return detect_faces(rgb)
+
+    detections = []
+    for x, y, w, h in regions:
+        for detection in detect_faces(rgb[y:y + h, x:x + w]):
+            box = detection['box']
+            detection['box'] = [box[0] + x, box[1] + y, box[2], box[3]]
+            detection['keypoints'] = {
+                name: (px + x, py + y)
+                for name, (px, py) in detection['keypoints'].items()}
+            detections.append(detection)
+    return detections
+
+
+def box_center(box):
+    x, y, w, h = box
+    return x + w / 2.0, y + h / 2.0
+
+
+def in_regions(box, regions):
+    """True if the box's centre lies in any region (always, for a full frame)."""
+    if not regions:
+        return True
+    cx, cy = box_center(box)
+    return any(x <= cx < x + w and y <= cy < y + h for x, y, w, h in regions)
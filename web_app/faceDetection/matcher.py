@@ -0,0 +1,170 @@
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+from web_app.attendance import roster_ids as course_roster_ids
+from web_app.config import Config
+from web_app.faceDetection.gallery import FaceGallery
+
+Match = namedtuple('Match', ['user_id', 'score'])
+# Sorted gallery, its distinct user ids and where each user's rows start
+_MatcherState = namedtuple('_MatcherState', ['gallery', 'user_ids', 'starts'])
+
+
+def assign_matches(matches):
+    """Resolve per-face candidate lists so no student is assigned twice.
+
+    Faces are resolved in order of confidence and each takes its best
+    candidate that a more confident face has not already claimed.
+    Returns one Match (or None) per face.
+    """
+    assigned = [None] * len(matches)
+    taken = set()
+    by_confidence = sorted(range(len(matches)),
+                           key=lambda i: -matches[i][0].score if matches[i] else 0.0)
+    for i in by_confidence:
+        for candidate in matches[i]:
+            if candidate.user_id not in taken:
+                assigned[i] = candidate
+                taken.add(candidate.user_id)
+                break
+    return assigned
+
+
+class FaceMatcher:
+    """Exact matcher: scores a batch of faces against a gallery in one matmul.
+
+    Gallery rows are sorted by user so that each student's images form one
+    contiguous block of columns; a student's score for a face is the best
+    similarity over their block. Changing a student's embeddings builds a
+    new state and swaps it in with one assignment, so a match running on
+    another thread sees either the old gallery or the new one.
+    """
+
+    def __init__(self, gallery, threshold=None, top_k=None):
+        self.threshold = Config.FACE_MATCH_THRESHOLD if threshold is None else threshold
+        self.top_k = Config.FACE_MATCH_TOP_K if top_k is None else top_k
+        self._state = self._build(gallery)
+        self._write_lock = threading.Lock()
+
+    @staticmethod
+    def _build(gallery):
+        order = np.argsort(gallery.user_ids, kind='stable')
+        gallery = FaceGallery(gallery.embeddings[order], gallery.user_ids[order],
+                              gallery.image_ids[order])
+        user_ids, starts = np.unique(gallery.user_ids, return_index=True)
+        return _MatcherState(gallery, user_ids, starts)
+
+    @property
+    def gallery(self):
+        return self._state.gallery
+
+    @property
+    def user_ids(self):
+        return self._state.user_ids
+
+    def __len__(self):
+        return len(self._state.user_ids)
+
+    def replace(self, user_id, embeddings, image_ids=None):
+        """Set a student's embeddings; none removes the student."""
+        self.replace_many({user_id: (embeddings, image_ids)})
+
+    def replace_many(self, changes):
+        """Set the embeddings of several students at once.
+
+        ``changes`` maps user id -> (embeddings, image ids or None); empty
+        embeddings remove the student. Costs one copy of the whole gallery
+        however many students change.
+        """
+        with self._write_lock:
+            gallery = self._state.gallery
+            parts = [gallery.subset(~np.isin(gallery.user_ids, list(changes)))]
+            for user_id, (embeddings, image_ids) in changes.items():
+                if len(embeddings):
+                    embeddings = np.asarray(embeddings, dtype=np.float32).reshape(
+                        len(embeddings), -1)
+                    if image_ids is None:
+                        image_ids = [-1] * len(embeddings)
+                    parts.append(FaceGallery(embeddings, [user_id] * len(embeddings),
+                                             image_ids))
+            parts = [part for part in parts if len(part)] or parts[:1]
+            gallery = FaceGallery(np.vstack([part.embeddings for part in parts]),
+                                  np.concatenate([part.user_ids for part in parts]),
+                                  np.concatenate([part.image_ids for part in parts]))
+            self._state = self._build(gallery)
+
+    def remove(self, user_id):
+        self.replace(user_id, [])
+
+    def scores(self, queries, state=None):
+        """Return an (n_faces, n_users) matrix of best similarity per student."""
+        state = state or self._state
+        embeddings = state.gallery.embeddings
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, embeddings.shape[1])
+        similarities = queries @ embeddings.T
+        return np.maximum.reduceat(similarities, state.starts, axis=1)
+
+    def match(self, queries, top_k=None, threshold=None):
+        """Return, for each face, up to top_k Matches above the threshold."""
+        top_k = self.top_k if top_k is None else top_k
+        threshold = self.threshold if threshold is None else threshold
+        state = self._state
+        if len(state.user_ids) == 0 or len(queries) == 0:
+            return [[] for _ in range(len(queries))]
+
+        scores = self.scores(queries, state)
+        k = min(top_k, scores.shape[1])
+        # argpartition finds the k best columns per row without a full sort
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1)
+        candidates = np.take_along_axis(candidates, order, axis=1)
+        candidate_scores = np.take_along_axis(candidate_scores, order, axis=1)
+
+        results = []
+        for row_users, row_scores in zip(state.user_ids[candidates], candidate_scores):
+            keep = row_scores >= threshold
+            results.append([Match(int(u), float(s))
+                            for u, s in zip(row_users[keep], row_scores[keep])])
+        return results
+
+    def assign(self, queries, threshold=None):
+        """Match the faces of one frame so no student is assigned twice."""
+        return assign_matches(self.match(queries, threshold=threshold))
+
+
+class CourseCandidateIndex:
+    """Matches faces against a course roster before the whole gallery.
+
+    Faces are first assigned among the students enrolled in the course. Only
+    faces left unmatched are searched in the fallback index (the campus-wide
+    gallery), so the common case scores a few hundred students instead of
+    the whole campus.
+    """
+
+    def __init__(self, roster_gallery, roster_ids, fallback=None,
+                 threshold=None, top_k=None):
+        self.roster_ids = frozenset(int(i) for i in roster_ids)
+        self.roster = FaceMatcher(roster_gallery, threshold, top_k)
+        self.fallback = fallback
+
+    @classmethod
+    def for_course(cls, course_id, fallback=None, threshold=None, top_k=None):
+        roster_ids = course_roster_ids(course_id)
+        return cls(FaceGallery.load(roster_ids), roster_ids, fallback,
+                   threshold, top_k)
+
+    def assign(self, queries):
+        """Return one Match (or None) per face, roster matches first."""
+        assigned = self.roster.assign(queries)
+        unmatched = [i for i, match in enumerate(assigned) if match is None]
+        if unmatched and self.fallback is not None and len(self.fallback):
+            # The fallback gallery also holds the roster; those students
+            # were already considered above.
+            matches = [[m for m in candidates if m.user_id not in self.roster_ids]
+                       for candidates in self.fallback.match(np.asarray(queries)[unmatched])]
+            for i, match in zip(unmatched, assign_matches(matches)):
+                assigned[i] = match
+        return assigned
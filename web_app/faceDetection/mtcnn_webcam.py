@@ -0,0 +1,84 @@
+import os
+from datetime import datetime
+
+from web_app.attendance import AttendanceAccumulator
+from web_app.extensions import db
+from web_app.jobs import worker_alive
+from web_app.models import ClassSession
+from web_app.metrics import STAGE_SECONDS
+from web_app.faceDetection.matcher import CourseCandidateIndex
+from web_app.faceDetection.ann import get_global_index
+from web_app.faceDetection.embedding import require_face_model
+from web_app.faceDetection.sessions import SessionError, session_manager
+
+
+def build_course_index(course_id):
+    # Embeddings are computed at registration, so this only loads the
+    # roster's vectors; the campus-wide index is shared between sessions
+    return CourseCandidateIndex.for_course(
+        course_id, fallback=get_global_index())
+
+
+def start_face_detection(course_id, classroom=None, class_session=None):
+    """Start recognition for a course, on the given classroom's camera.
+
+    Attendance is recorded against ``class_session`` when given. If the
+    course is still running an earlier class that was never ended, that
+    class is stopped and its attendance written first. Raises
+    FaceModelError when no face embedding model is configured.
+    """
+    running = session_manager.get(course_id)
+    if running is not None:
+        if class_session is None or running.attendance.session_id == class_session.id:
+            return running
+        stop_face_detection(course_id)
+
+    require_face_model()
+    attendance = AttendanceAccumulator(
+        course_id, class_session.date, session_id=class_session.id
+    ) if class_session is not None else None
+    return session_manager.start(
+        course_id, build_course_index(course_id), classroom,
+        attendance=attendance)
+
+
+def close_orphaned_session(course_id, worker_id=None):
+    """Close a course's active class session that has no running pipeline.
+
+    That happens when the worker running the class died, or the start job
+    failed. A class that another live worker is running is left alone.
+    Students journaled before a restart are written as usual; otherwise the
+    session is marked failed and SessionError is raised, so the stop job
+    records the failure.
+    """
+    class_session = ClassSession.query.filter_by(
+        course_id=course_id, status='active').order_by(ClassSession.date.desc()).first()
+    if class_session is None:
+        raise SessionError(f'No recognition session is running for course {course_id}.')
+    if class_session.worker_id not in (None, worker_id) and worker_alive(class_session):
+        raise SessionError(f'The class for course {course_id} is running on '
+                           f'recognition worker {class_session.worker_id}.')
+
+    attendance = AttendanceAccumulator(
+        course_id, class_session.date, session_id=class_session.id)
+    if attendance.journal_path and os.path.exists(attendance.journal_path):
+        attendance.commit()
+        return attendance.present
+
+    class_session.status = 'failed'
+    class_session.end_time = datetime.now()
+    db.session.commit()
+    raise SessionError(f'No recognition session was running for course {course_id}; '
+                       'the class was closed without recording attendance.')
+
+
+def stop_face_detection(course_id, worker_id=None):
+    session = session_manager.stop(course_id)
+    if session is None:
+        return close_orphaned_session(course_id, worker_id)
+
+    # The whole roster is written, and the class session closed, in one
+    # bulk transaction
+    with STAGE_SECONDS.time(stage='db_write', **session.labels):
+        session.attendance.commit()
+    return session.recognized
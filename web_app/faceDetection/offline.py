@@ -0,0 +1,101 @@
+import os
+
+import cv2
+
+from web_app.config import Config
+from web_app.faceDetection.embedding import detect_faces, align_face, require_face_model
+from web_app.faceDetection.gating import thumbnail, changed_cells
+from web_app.faceDetection.tracking import FaceTracker, TrackedRecognizer
+from web_app.attendance import AttendanceAccumulator, open_class_session
+from web_app.faceDetection.mtcnn_webcam import build_course_index
+
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.bmp'}
+
+# Frames are compared on a GRID x GRID grid of cells
+_GRID = 4
+
+
+def iter_video_frames(path):
+    """Yield BGR frames from a recorded video file."""
+    capture = cv2.VideoCapture(path)
+    try:
+        while True:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            yield frame
+    finally:
+        capture.release()
+
+
+def iter_folder_frames(folder):
+    """Yield BGR frames from the image files of a folder, in name order."""
+    for filename in sorted(os.listdir(folder)):
+        if os.path.splitext(filename)[1].lower() not in IMAGE_EXTENSIONS:
+            continue
+        frame = cv2.imread(os.path.join(folder, filename))
+        if frame is not None:
+            yield frame
+
+
+def iter_source_frames(source):
+    if os.path.isdir(source):
+        return iter_folder_frames(source)
+    return iter_video_frames(source)
+
+
+def sample_changed_frames(frames, threshold=None):
+    """Drop frames that are near-duplicates of the last frame kept.
+
+    Frames are compared on a small grayscale thumbnail split into a grid;
+    a frame is kept when any cell's mean absolute difference reaches the
+    threshold, so one student moving is enough to keep it.
+    """
+    threshold = Config.OFFLINE_CHANGE_THRESHOLD if threshold is None else threshold
+    previous = None
+    for frame in frames:
+        thumb = thumbnail(frame)
+        if previous is not None and not changed_cells(
+                thumb, previous, _GRID, threshold).any():
+            continue
+        previous = thumb
+        yield frame
+
+
+def detect_frames(frames):
+    """Yield the face boxes and aligned crops of each frame."""
+    for frame in frames:
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        detections = detect_faces(rgb)
+        yield [d['box'] for d in detections], [align_face(rgb, d) for d in detections]
+
+
+def recognize_source(source, index, threshold=None, attendance=None):
+    """Run a video file or image folder through detection and matching.
+
+    Returns the set of roster students recognized in it.
+    """
+    # Snapshots in a folder are not consecutive frames, so a single match
+    # confirms a face there; video frames are voted on like a live session
+    tracker = FaceTracker(votes_to_confirm=1) if os.path.isdir(source) else None
+    recognizer = TrackedRecognizer(index, tracker, attendance)
+    for boxes, faces in detect_frames(sample_changed_frames(
+            iter_source_frames(source), threshold)):
+        recognizer.process((), boxes, faces)
+    return recognizer.recognized
+
+
+def run_offline_attendance(course_id, source, date=None, threshold=None):
+    """Take attendance for a course from a recording instead of a camera.
+
+    Writes the same Attendance rows a live session would, dated ``date``
+    (the day of the lecture) when given.
+    """
+    require_face_model()
+    class_session = open_class_session(course_id, date)
+    attendance = AttendanceAccumulator(
+        course_id, class_session.date, session_id=class_session.id)
+    recognized = recognize_source(
+        source, build_course_index(course_id), threshold, attendance)
+    attendance.commit()
+    return recognized
@@ -0,0 +1,303 @@
+import heapq
+import logging
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+
+import cv2
+
+from web_app.attendance import AttendanceAccumulator
+from web_app.config import Config
+from web_app.metrics import STAGE_SECONDS
+import numpy as np
+
+from web_app.faceDetection.embedding import align_face
+from web_app.faceDetection.framebuffer import FrameRing
+from web_app.faceDetection.gating import MotionGate, detect_in_regions
+from web_app.faceDetection.tracking import TrackedRecognizer
+
+# Seconds a stage waits on its input queue before re-checking for stop
+_POLL_SECONDS = 0.2
+
+logger = logging.getLogger(__name__)
+
+# Spawned (not forked) children, so MTCNN is never initialised in a fork
+_mp = mp.get_context('spawn')
+
+
+def _offer(q, item, dropped):
+    """Put without blocking; count the item as dropped if the queue is full."""
+    try:
+        q.put_nowait(item)
+    except queue.Full:
+        with dropped.get_lock():
+            dropped.value += 1
+
+
+def capture_frames(camera_index, ring, frames, stop_event, captured, dropped,
+                   skipped):
+    """Frame-grab stage: read the camera straight into shared-memory slots.
+
+    Frames that the motion gate finds static are released without being
+    sent for detection. Each frame carries its capture time downstream, as
+    metrics recorded in this process would never be exported.
+    """
+    frames.cancel_join_thread()
+    gate = MotionGate()
+    capture = cv2.VideoCapture(camera_index)
+    capture.set(cv2.CAP_PROP_FRAME_HEIGHT, ring.shape[0])
+    capture.set(cv2.CAP_PROP_FRAME_WIDTH, ring.shape[1])
+    try:
+        while not stop_event.is_set():
+            slot = ring.acquire()
+            if slot is None:
+                # Every slot is still being detected on: skip this frame
+                if not capture.grab():
+                    break
+                with dropped.get_lock():
+                    dropped.value += 1
+                continue
+
+            started = time.perf_counter()
+            slot_frame = ring.frames[slot]
+            ok, frame = capture.read(slot_frame)
+            if not ok:
+                ring.release(slot)
+                break
+            height, width = ring.shape[:2]
+            if frame.ctypes.data != slot_frame.ctypes.data:
+                # The camera resolution differs from the slot size
+                height, width = ring.write(slot, frame)
+
+            with captured.get_lock():
+                captured.value += 1
+                sequence = captured.value
+
+            regions = gate.check(slot_frame[:height, :width])
+            if regions is None:
+                ring.release(slot)
+                with skipped.get_lock():
+                    skipped.value += 1
+                continue
+            frames.put(ring.publish(slot, sequence, height, width) +
+                       (regions, time.perf_counter() - started))
+    finally:
+        capture.release()
+
+
+def detect_and_align(ring, frames, results, stop_event, processed, dropped):
+    """Detection stage: MTCNN and alignment for one frame at a time."""
+    results.cancel_join_thread()
+    while not stop_event.is_set():
+        try:
+            slot, sequence, regions, capture_seconds = frames.get(timeout=_POLL_SECONDS)
+        except queue.Empty:
+            continue
+        started = time.perf_counter()
+        # The colour conversion is the only read of the slot, so it can be
+        # handed back to the capture stage straight away
+        rgb = cv2.cvtColor(ring.view(slot, sequence), cv2.COLOR_BGR2RGB)
+        ring.release(slot)
+
+        detections = detect_in_regions(rgb, regions)
+        faces = [align_face(rgb, d) for d in detections]
+        with processed.get_lock():
+            processed.value += 1
+        # Only boxes and small aligned crops travel to the matching stage;
+        # empty results still tell it the faces in those regions left
+        timings = {'capture': capture_seconds,
+                   'detect': time.perf_counter() - started}
+        _offer(results, (sequence, regions, [d['box'] for d in detections],
+                         np.stack(faces) if faces else None, timings), dropped)
+
+
+class ReorderBuffer:
+    """Puts frames finished by parallel detectors back in capture order.
+
+    Each frame is held until ``delay`` seconds after it arrived (or until
+    more than ``capacity`` are held), so an older frame a slower detector
+    is still working on, typically a full-frame refresh, can overtake it.
+    Sequence gaps left by frames the gate skipped or the stages dropped
+    only cost the delay. A frame arriving after a newer one was released
+    is stale.
+    """
+
+    def __init__(self, delay, capacity):
+        self.delay = delay
+        self.capacity = capacity
+        self.last_sequence = 0
+        self.stale = 0
+        self._held = []
+
+    def __len__(self):
+        return len(self._held)
+
+    def push(self, sequence, item, now=None):
+        if sequence <= self.last_sequence:
+            self.stale += 1
+            return
+        heapq.heappush(self._held, (sequence, time.monotonic() if now is None else now, item))
+
+    def next_deadline(self):
+        """When the longest-held frame is due, or None if none is held."""
+        return min(arrived for _, arrived, _ in self._held) + self.delay if self._held else None
+
+    def pop_ready(self, now=None, flush=False):
+        """Release, oldest sequence first, every frame that is due."""
+        now = time.monotonic() if now is None else now
+        ready = []
+        while self._held and (flush or len(self._held) > self.capacity or
+                              self.next_deadline() <= now):
+            sequence, _, item = heapq.heappop(self._held)
+            self.last_sequence = sequence
+            ready.append(item)
+        return ready
+
+
+class RecognitionPipeline:
+    """Staged recognition for one course session.
+
+    A capture process feeds a pool of detection processes, which feed the
+    matching stage. Frames stay in a shared-memory FrameRing and only slot
+    indices cross process boundaries. When the detectors fall behind and
+    no slot is free, new frames are dropped instead of queued so latency
+    and memory stay bounded. Matching runs on a thread of the owning
+    process, where the shared gallery index already lives; a ReorderBuffer
+    there restores capture order before frames reach the tracker.
+
+    A MotionGate in the capture stage skips static frames and limits
+    detection to the regions that changed. The matching stage tracks faces
+    across frames and only embeds tracks whose identity is not yet
+    confirmed (see TrackedRecognizer).
+    """
+
+    def __init__(self, course_id, index, camera_index=None,
+                 detection_workers=None, queue_size=None, attendance=None,
+                 classroom_id=None):
+        self.course_id = course_id
+        # Metric labels for this session
+        self.labels = {'course': course_id,
+                       'classroom': '' if classroom_id is None else classroom_id}
+        self.index = index
+        self.camera_index = Config.CAMERA_INDEX if camera_index is None else camera_index
+        self.detection_workers = detection_workers or Config.PIPELINE_DETECTION_WORKERS or max(
+            1, (os.cpu_count() or 1) - 2)
+        queue_size = queue_size or Config.PIPELINE_QUEUE_SIZE
+
+        self.attendance = attendance or AttendanceAccumulator(course_id)
+        self.recognizer = TrackedRecognizer(
+            index, attendance=self.attendance, labels=self.labels)
+
+        self._stop_event = _mp.Event()
+        self._ring = FrameRing.create(
+            queue_size, (Config.PIPELINE_FRAME_HEIGHT, Config.PIPELINE_FRAME_WIDTH, 3),
+            _mp.Queue(queue_size))
+        self._frames = _mp.Queue(queue_size)
+        self._results = _mp.Queue(queue_size)
+        self._captured = _mp.Value('i', 0)
+        self._processed = _mp.Value('i', 0)
+        self._dropped = _mp.Value('i', 0)
+        self._skipped = _mp.Value('i', 0)
+        # Updated by the matching thread only
+        self._reorder = ReorderBuffer(Config.PIPELINE_REORDER_SECONDS, queue_size)
+        self._match_errors = 0
+        self._processes = []
+        self._matcher_thread = None
+
+    def start(self):
+        self._processes.append(_mp.Process(
+            target=capture_frames, daemon=True,
+            args=(self.camera_index, self._ring, self._frames,
+                  self._stop_event, self._captured, self._dropped,
+                  self._skipped)))
+        for _ in range(self.detection_workers):
+            self._processes.append(_mp.Process(
+                target=detect_and_align, daemon=True,
+                args=(self._ring, self._frames, self._results,
+                      self._stop_event, self._processed, self._dropped)))
+        for process in self._processes:
+            process.start()
+
+        self._matcher_thread = threading.Thread(
+            target=self._match_results, daemon=True)
+        self._matcher_thread.start()
+
+    def _match_results(self):
+        while not self._stop_event.is_set():
+            deadline = self._reorder.next_deadline()
+            wait = _POLL_SECONDS if deadline is None else min(
+                _POLL_SECONDS, max(deadline - time.monotonic(), 0))
+            try:
+                self.receive(self._results.get(timeout=wait))
+            except queue.Empty:
+                pass
+            self.match_ready()
+
+    def receive(self, result):
+        """Hold a detected frame until it can be tracked in capture order."""
+        self._reorder.push(result[0], result)
+
+    def match_ready(self, flush=False):
+        for result in self._reorder.pop_ready(flush=flush):
+            self.record_matches(*result)
+
+    def record_matches(self, sequence, regions, boxes, faces, timings):
+        """Track and match one detected frame, in capture order.
+
+        A frame that fails to match is logged and counted; the session
+        carries on with the next one.
+        """
+        for stage, seconds in timings.items():
+            STAGE_SECONDS.observe(seconds, stage=stage, **self.labels)
+        try:
+            self.recognizer.process(regions, boxes, faces)
+        except Exception:
+            self._match_errors += 1
+            logger.exception('Matching failed for frame %s of course %s',
+                             sequence, self.course_id)
+
+    @property
+    def recognized(self):
+        return self.recognizer.recognized
+
+    @property
+    def visitors(self):
+        return self.recognizer.visitors
+
+    def stats(self):
+        captured = self._captured.value
+        stats = {
+            'course_id': self.course_id,
+            'frames_captured': captured,
+            'frames_processed': self._processed.value,
+            'frames_dropped': self._dropped.value,
+            'frames_skipped': self._skipped.value,
+            'frames_stale': self._reorder.stale,
+            'match_errors': self._match_errors,
+            'skip_ratio': round(self._skipped.value / captured, 3) if captured else 0.0,
+            'detection_workers': self.detection_workers,
+        }
+        stats.update(self.recognizer.stats())
+        return stats
+
+    def stop(self, timeout=5):
+        self._stop_event.set()
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        if self._matcher_thread is not None:
+            self._matcher_thread.join()
+
+        # Match whatever the detectors finished before they stopped
+        while True:
+            try:
+                result = self._results.get_nowait()
+            except (queue.Empty, OSError, ValueError):
+                break
+            self.receive(result)
+        self.match_ready(flush=True)
+
+        self._ring.close()
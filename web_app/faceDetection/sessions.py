@@ -0,0 +1,112 @@
+import atexit
+import os
+import threading
+import time
+
+from web_app.config import Config
+
+
+class SessionError(Exception):
+    pass
+
+
+def camera_source(classroom):
+    """Camera for a classroom: its configured device index or stream URL."""
+    source = classroom.camera if classroom is not None else None
+    if not source:
+        return Config.CAMERA_INDEX
+    return int(source) if source.isdigit() else source
+
+
+class SessionManager:
+    """Runs one recognition pipeline per classroom, within a CPU budget.
+
+    Each session gets up to Config.SESSION_DETECTION_WORKERS detection
+    processes, and the detection processes of all live sessions together
+    never exceed Config.MAX_DETECTION_WORKERS.
+    """
+
+    def __init__(self, max_workers=None, session_workers=None):
+        self.max_workers = max_workers or Config.MAX_DETECTION_WORKERS or max(
+            1, (os.cpu_count() or 1) - 1)
+        self.session_workers = session_workers or Config.SESSION_DETECTION_WORKERS
+        # course id -> (classroom id, pipeline, start time)
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def workers_in_use(self):
+        return sum(p.detection_workers for _, p, _ in self._sessions.values())
+
+    def get(self, course_id):
+        with self._lock:
+            entry = self._sessions.get(course_id)
+        return entry[1] if entry else None
+
+    def start(self, course_id, index, classroom=None, workers=None,
+              attendance=None):
+        classroom_id = classroom.id if classroom is not None else None
+        with self._lock:
+            if course_id in self._sessions:
+                return self._sessions[course_id][1]
+            if classroom_id is not None and any(
+                    c == classroom_id for c, _, _ in self._sessions.values()):
+                raise SessionError(
+                    f'Classroom {classroom.name} already has a session running.')
+
+            available = self.max_workers - self.workers_in_use()
+            workers = min(workers or self.session_workers, available)
+            if workers < 1:
+                raise SessionError(
+                    'All recognition workers are busy; try again when a class ends.')
+
+            # Loads OpenCV and MTCNN on the first session in this process
+            from web_app.faceDetection.pipeline import RecognitionPipeline
+
+            pipeline = RecognitionPipeline(
+                course_id, index, camera_index=camera_source(classroom),
+                detection_workers=workers, attendance=attendance,
+                classroom_id=classroom_id)
+            pipeline.start()
+            self._sessions[course_id] = (classroom_id, pipeline, time.time())
+            return pipeline
+
+    def stop(self, course_id):
+        with self._lock:
+            entry = self._sessions.pop(course_id, None)
+        if entry is None:
+            return None
+        entry[1].stop()
+        return entry[1]
+
+    def status(self):
+        now = time.time()
+        with self._lock:
+            sessions = list(self._sessions.values())
+
+        status = []
+        for classroom_id, pipeline, started in sessions:
+            stats = pipeline.stats()
+            elapsed = max(now - started, 1e-6)
+            stats.update({
+                'classroom_id': classroom_id,
+                'running_seconds': round(elapsed, 1),
+                'capture_fps': round(stats['frames_captured'] / elapsed, 2),
+                'processed_fps': round(stats['frames_processed'] / elapsed, 2),
+            })
+            status.append(stats)
+        return {
+            'sessions': status,
+            'workers_in_use': sum(s['detection_workers'] for s in status),
+            'max_workers': self.max_workers,
+        }
+
+    def shutdown(self):
+        """Stop every running session, e.g. when the server exits."""
+        with self._lock:
+            course_ids = list(self._sessions)
+        for course_id in course_ids:
+            self.stop(course_id)
+
+
+session_manager = SessionManager()
+atexit.register(session_manager.shutdown)
@@ -0,0 +1,175 @@
+import time
+from collections import Counter
+
+import numpy as np
+
+from web_app.config import Config
+from web_app.metrics import STAGE_SECONDS
+from web_app.faceDetection.embedding import embed_faces
+from web_app.faceDetection.gating import in_regions
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """Pairwise intersection-over-union of two lists of (x, y, w, h) boxes."""
+    a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    ax2, ay2 = a[:, 0] + a[:, 2], a[:, 1] + a[:, 3]
+    bx2, by2 = b[:, 0] + b[:, 2], b[:, 1] + b[:, 3]
+    inter_w = np.clip(np.minimum(ax2[:, None], bx2) -
+                      np.maximum(a[:, 0, None], b[:, 0]), 0, None)
+    inter_h = np.clip(np.minimum(ay2[:, None], by2) -
+                      np.maximum(a[:, 1, None], b[:, 1]), 0, None)
+    inter = inter_w * inter_h
+    union = (a[:, 2] * a[:, 3])[:, None] + b[:, 2] * b[:, 3] - inter
+    return inter / np.maximum(union, 1e-6)
+
+
+class Track:
+    def __init__(self, track_id, box, now=None):
+        self.id = track_id
+        self.box = box
+        self.misses = 0
+        # Embeddings tried in the current voting round, and when it began
+        self.attempts = 0
+        self.round_started = time.monotonic() if now is None else now
+        self.votes = Counter()
+        self.user_id = None
+        # Set once the track is confirmed as a roster student
+        self.settled = False
+
+    @property
+    def confirmed(self):
+        return self.user_id is not None
+
+
+class FaceTracker:
+    """Gives faces stable track ids across frames by greedy IoU matching.
+
+    Only tracks inside the regions detected on for a frame are updated;
+    the rest are carried forward unchanged. A track that goes unmatched for
+    more than ``max_misses`` detections is dropped.
+
+    Identities are voted on in rounds of up to ``max_attempts`` embeddings.
+    A track that is not settled (unconfirmed, or confirmed as a visitor)
+    starts a fresh round every ``retry_seconds``, so poor crops while a
+    student walks in, or an early mistaken match, are not final.
+    """
+
+    def __init__(self, iou_threshold=None, max_misses=None,
+                 votes_to_confirm=None, max_attempts=None, retry_seconds=None):
+        self.iou_threshold = Config.TRACK_IOU_THRESHOLD if iou_threshold is None else iou_threshold
+        self.max_misses = Config.TRACK_MAX_MISSES if max_misses is None else max_misses
+        self.votes_to_confirm = votes_to_confirm or Config.TRACK_VOTES_TO_CONFIRM
+        self.max_attempts = max_attempts or Config.TRACK_MAX_EMBEDDINGS
+        self.retry_seconds = Config.TRACK_RETRY_SECONDS if retry_seconds is None else retry_seconds
+        self.tracks = []
+        self._next_id = 1
+
+    def update(self, boxes, regions=()):
+        """Return the track for each box, creating tracks for new faces."""
+        candidates = [t for t in self.tracks if in_regions(t.box, regions)]
+        assigned = [None] * len(boxes)
+        matched = set()
+        if candidates and boxes:
+            overlaps = iou_matrix([t.box for t in candidates], boxes)
+            # Resolve the most overlapping pairs first
+            for flat in np.argsort(-overlaps, axis=None):
+                ti, bi = np.unravel_index(flat, overlaps.shape)
+                if overlaps[ti, bi] < self.iou_threshold:
+                    break
+                if assigned[bi] is None and ti not in matched:
+                    matched.add(ti)
+                    candidates[ti].box = boxes[bi]
+                    assigned[bi] = candidates[ti]
+
+        for ti, track in enumerate(candidates):
+            track.misses = 0 if ti in matched else track.misses + 1
+        self.tracks = [t for t in self.tracks if t.misses <= self.max_misses]
+
+        for i, box in enumerate(boxes):
+            if assigned[i] is None:
+                assigned[i] = Track(self._next_id, box)
+                self._next_id += 1
+                self.tracks.append(assigned[i])
+        return assigned
+
+    def needs_embedding(self, track, now=None):
+        if track.settled:
+            return False
+        if track.attempts < self.max_attempts:
+            return True
+        now = time.monotonic() if now is None else now
+        if now - track.round_started < self.retry_seconds:
+            return False
+        # New round: earlier votes may come from poor crops
+        track.attempts = 0
+        track.votes.clear()
+        track.round_started = now
+        return True
+
+    def vote(self, track, match):
+        """Record one recognition attempt; confirm once a student has enough votes."""
+        track.attempts += 1
+        if match is None:
+            return
+        track.votes[match.user_id] += 1
+        user_id, votes = track.votes.most_common(1)[0]
+        if votes >= self.votes_to_confirm:
+            track.user_id = user_id
+
+
+class TrackedRecognizer:
+    """Turns per-frame detections into confirmed student identities.
+
+    Faces are tracked across frames; a track is embedded and matched only
+    until votes confirm it as a roster student, after which it is never
+    embedded again. Tracks confirmed as visitors keep being voted on in
+    later rounds. Confirmed roster students are also marked present on the
+    optional AttendanceAccumulator. With ``labels``, embedding and
+    matching times are recorded in the pipeline stage metrics.
+    """
+
+    def __init__(self, index, tracker=None, attendance=None, labels=None):
+        self.index = index
+        self.tracker = tracker or FaceTracker()
+        self.attendance = attendance
+        self.labels = labels
+        self.recognized = set()
+        self.visitors = set()
+        self.embeddings_computed = 0
+
+    def process(self, regions, boxes, faces):
+        tracks = self.tracker.update(boxes, regions)
+        pending = [i for i, track in enumerate(tracks)
+                   if self.tracker.needs_embedding(track)]
+        if not pending:
+            return tracks
+
+        self.embeddings_computed += len(pending)
+        started = time.perf_counter()
+        embeddings = embed_faces([faces[i] for i in pending])
+        embedded = time.perf_counter()
+        matches = self.index.assign(embeddings)
+        if self.labels is not None:
+            STAGE_SECONDS.observe(embedded - started, stage='embed', **self.labels)
+            STAGE_SECONDS.observe(time.perf_counter() - embedded, stage='match',
+                                  **self.labels)
+        for i, match in zip(pending, matches):
+            track = tracks[i]
+            self.tracker.vote(track, match)
+            if track.confirmed:
+                if track.user_id in self.index.roster_ids:
+                    track.settled = True
+                    self.recognized.add(track.user_id)
+                    if self.attendance is not None:
+                        self.attendance.mark_present(track.user_id)
+                else:
+                    self.visitors.add(track.user_id)
+        return tracks
+
+    def stats(self):
+        return {
+            'faces_in_view': len(self.tracker.tracks),
+            'tracks_confirmed': sum(t.confirmed for t in self.tracker.tracks),
+            'embeddings_computed': self.embeddings_computed,
+        }
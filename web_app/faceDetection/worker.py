@@ -0,0 +1,154 @@
+import json
+import os
+import socket
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from web_app.config import Config
+from web_app.extensions import db
+from web_app.jobs import (claim_next_job, finish_job, reclaim_stale_images, reclaim_stale_jobs,
+                          record_heartbeat)
+from web_app.metrics import render_metrics
+from web_app.models import ClassSession, Classroom
+from web_app.faceDetection.ann import sync_global_index
+from web_app.faceDetection.embedding import FaceModelError
+from web_app.faceDetection.enrollment import enroll_pending
+from web_app.faceDetection.mtcnn_webcam import start_face_detection, stop_face_detection
+from web_app.faceDetection.sessions import session_manager
+
+
+class StatusHandler(BaseHTTPRequestHandler):
+    # Read-only API for the web tier and Prometheus; commands arrive through
+    # the job queue
+
+    def do_GET(self):
+        path = self.path.rstrip('/')
+        if path == '/status':
+            body = json.dumps(session_manager.status()).encode()
+            content_type = 'application/json'
+        elif path == '/metrics':
+            body = render_metrics().encode()
+            content_type = 'text/plain; version=0.0.4'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class RecognitionWorker:
+    """Run recognition sessions for the jobs the web tier queues.
+
+    One worker process owns the cameras and detection processes of a
+    machine; web workers only write RecognitionJob rows and read the
+    status API, so the two tiers scale independently. Each class session
+    records the worker that started it, and only that worker takes its stop
+    job while its heartbeat is fresh. Uploaded images the web tier recorded
+    as pending are embedded here too, on a thread of their own so a large
+    batch never delays a start or stop.
+    """
+
+    def __init__(self, app, host=None, port=None, poll_interval=None,
+                 worker_id=None):
+        self.app = app
+        # Unique per process, so a restarted worker never passes for the
+        # one that ran a class before it
+        self.worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}'
+        self.address = (host or Config.RECOGNITION_WORKER_HOST,
+                        port or Config.RECOGNITION_WORKER_PORT)
+        self.poll_interval = poll_interval or Config.RECOGNITION_WORKER_POLL
+        self._stop = threading.Event()
+
+    def handle(self, job):
+        if job.action == 'start':
+            class_session = db.session.get(ClassSession, job.session_id) \
+                if job.session_id is not None else None
+            classroom = db.session.get(Classroom, class_session.classroom_id) \
+                if class_session is not None and class_session.classroom_id else None
+            start_face_detection(job.course_id, classroom, class_session)
+            if class_session is not None:
+                class_session.worker_id = self.worker_id
+                class_session.heartbeat_at = datetime.now()
+                db.session.commit()
+        else:
+            stop_face_detection(job.course_id, self.worker_id)
+
+    def heartbeat(self):
+        record_heartbeat(self.worker_id)
+
+    def housekeeping(self):
+        # Recover jobs orphaned by a worker that died, and bring enrollments
+        # and departures committed by any process into the campus-wide index
+        # of running sessions
+        for task in (self.heartbeat, reclaim_stale_jobs, reclaim_stale_images,
+                     sync_global_index):
+            try:
+                task()
+            except Exception:
+                db.session.rollback()
+                self.app.logger.exception('Recognition worker %s failed', task.__name__)
+        db.session.remove()
+
+    def run_once(self):
+        """Process one queued job; returns False when the queue is empty."""
+        job = claim_next_job(self.worker_id)
+        if job is None:
+            return False
+        try:
+            self.handle(job)
+        except Exception as e:
+            db.session.rollback()
+            finish_job(job, str(e) or e.__class__.__name__)
+        else:
+            finish_job(job)
+        finally:
+            db.session.remove()
+        return True
+
+    def enroll(self):
+        """Embed pending images until stopped."""
+        warned = False
+        with self.app.app_context():
+            while not self._stop.is_set():
+                claimed = 0
+                try:
+                    claimed = enroll_pending(Config.UPLOAD_FOLDER)
+                except FaceModelError as e:
+                    if not warned:
+                        self.app.logger.warning('Enrollment paused: %s', e)
+                        warned = True
+                except Exception:
+                    db.session.rollback()
+                    self.app.logger.exception('Enrollment batch failed')
+                finally:
+                    db.session.remove()
+                if not claimed:
+                    self._stop.wait(self.poll_interval)
+
+    def run(self):
+        server = ThreadingHTTPServer(self.address, StatusHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        enroller = threading.Thread(target=self.enroll, daemon=True)
+        enroller.start()
+        try:
+            with self.app.app_context():
+                while not self._stop.is_set():
+                    self.housekeeping()
+                    if not self.run_once():
+                        self._stop.wait(self.poll_interval)
+        finally:
+            self._stop.set()
+            enroller.join()
+            server.shutdown()
+            server.server_close()
+            session_manager.shutdown()
+
+    def stop(self):
+        self._stop.set()
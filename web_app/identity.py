@@ -0,0 +1,67 @@
+from collections import namedtuple
+
+from flask_login import UserMixin
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from web_app.cache import LRUCache
+from web_app.config import Config
+from web_app.extensions import db
+from web_app.models import User
+
+
+class UserSnapshot(UserMixin, namedtuple(
+        'UserSnapshot', 'id name email role enrollment_number')):
+    """Immutable copy of the User columns views read from current_user.
+
+    Relationships are not included; views needing them load the User row.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.name, user.email, user.role,
+                   user.enrollment_number)
+
+
+# Snapshots by user id, so authenticated requests skip the user query.
+# Changes committed through the ORM in this process evict the user at once;
+# other processes (another web worker, a CLI command) see them, including
+# role changes and deletions, within the short USER_CACHE_TTL.
+_snapshots = LRUCache(Config.USER_CACHE_SIZE, Config.USER_CACHE_TTL)
+
+
+def load_identity(user_id):
+    snapshot = _snapshots.get(user_id)
+    if snapshot is None:
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        snapshot = UserSnapshot.from_user(user)
+        _snapshots.set(user_id, snapshot)
+    return snapshot
+
+
+def forget_identity(user_id):
+    _snapshots.delete_many([user_id])
+
+
+# Evict only once the change commits: evicting at flush lets a concurrent
+# request reload the old row and cache it again before the commit lands
+@event.listens_for(Session, 'after_flush')
+def _collect_changed_users(session, flush_context):
+    changed = [obj.id for obj in (*session.dirty, *session.deleted)
+               if isinstance(obj, User)]
+    if changed:
+        session.info.setdefault('changed_users', set()).update(changed)
+
+
+@event.listens_for(Session, 'after_commit')
+def _forget_changed_users(session):
+    for user_id in session.info.pop('changed_users', ()):
+        forget_identity(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changed_users(session):
+    session.info.pop('changed_users', None)
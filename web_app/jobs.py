@@ -0,0 +1,169 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_
+
+from web_app.config import Config
+from web_app.extensions import db
+from web_app.models import ClassSession, Image, RecognitionJob
+
+JOB_ACTIONS = ('start', 'stop')
+
+
+def enqueue_job(action, course_id, session_id=None):
+    """Queue a start/stop command for the recognition worker.
+
+    A stop without a session_id is for the course's active class session,
+    so it can be routed to the worker running that class.
+    """
+    if action not in JOB_ACTIONS:
+        raise ValueError(f'Unknown recognition job action: {action}')
+    if action == 'stop' and session_id is None:
+        active = ClassSession.query.filter_by(
+            course_id=course_id, status='active').order_by(ClassSession.date.desc()).first()
+        session_id = active.id if active is not None else None
+    job = RecognitionJob(action=action, course_id=course_id,
+                         session_id=session_id, status='queued')
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def worker_alive(class_session):
+    """Whether the worker running a class session has reported in recently."""
+    timeout = timedelta(seconds=Config.RECOGNITION_WORKER_TIMEOUT)
+    return (class_session.worker_id is not None and
+            class_session.heartbeat_at is not None and
+            class_session.heartbeat_at >= datetime.now() - timeout)
+
+
+def record_heartbeat(worker_id):
+    """Mark the active class sessions run by ``worker_id`` as still alive."""
+    db.session.execute(ClassSession.__table__.update().where(
+        ClassSession.worker_id == worker_id, ClassSession.status == 'active'
+    ).values(heartbeat_at=datetime.now()))
+    db.session.commit()
+
+
+def _meant_for_another_worker(job, worker_id):
+    # A stop must reach the worker whose pipeline holds the class's
+    # attendance. Any worker may take it once that worker is dead, or when
+    # the class never started anywhere
+    if job.action != 'stop' or job.session_id is None:
+        return False
+    class_session = db.session.get(ClassSession, job.session_id)
+    if class_session is None or class_session.status != 'active':
+        return False
+    if class_session.worker_id is None:
+        # Wait for a start still on its way to a worker
+        return db.session.query(RecognitionJob.query.filter(
+            RecognitionJob.session_id == job.session_id,
+            RecognitionJob.action == 'start',
+            RecognitionJob.status.in_(('queued', 'running'))).exists()).scalar()
+    return class_session.worker_id != worker_id and worker_alive(class_session)
+
+
+def claim_next_job(worker_id=None):
+    """Take the oldest queued job for this worker and mark it running, or
+    return None.
+
+    Stop jobs are only taken by the worker running their class (see
+    _meant_for_another_worker). The claim is a conditional UPDATE, so when
+    several workers poll the same queue only one of them gets each job.
+    """
+    table = RecognitionJob.__table__
+    job_ids = db.session.execute(
+        db.select(table.c.id).where(table.c.status == 'queued')
+        .order_by(table.c.id)).scalars().all()
+    for job_id in job_ids:
+        job = db.session.get(RecognitionJob, job_id)
+        if job is None or (worker_id is not None and
+                           _meant_for_another_worker(job, worker_id)):
+            continue
+        claimed = db.session.execute(table.update().where(
+            table.c.id == job_id, table.c.status == 'queued').values(
+                status='running', started_at=datetime.now())).rowcount
+        db.session.commit()
+        if claimed:
+            return db.session.get(RecognitionJob, job_id)
+    db.session.commit()
+    return None
+
+
+def reclaim_stale_jobs(timeout=None):
+    """Recover jobs left running by a worker that died.
+
+    A job counts as abandoned once it has run for Config.RECOGNITION_JOB_TIMEOUT
+    seconds. Stop jobs are queued again, so their class session still gets
+    closed; start jobs fail rather than turn a camera on long after the
+    request. Returns the number of jobs recovered.
+    """
+    timeout = Config.RECOGNITION_JOB_TIMEOUT if timeout is None else timeout
+    table = RecognitionJob.__table__
+    stale = (table.c.status == 'running') & or_(
+        table.c.started_at.is_(None),
+        table.c.started_at < datetime.now() - timedelta(seconds=timeout))
+    requeued = db.session.execute(table.update().where(
+        stale, table.c.action == 'stop').values(
+            status='queued', started_at=None)).rowcount
+    failed = db.session.execute(table.update().where(
+        stale, table.c.action == 'start').values(
+            status='failed', finished_at=datetime.now(),
+            error='The recognition worker stopped before starting the session.')).rowcount
+    db.session.commit()
+    return requeued + failed
+
+
+def finish_job(job, error=None):
+    job.status = 'failed' if error else 'done'
+    job.error = error[:255] if error else None
+    job.finished_at = datetime.now()
+    db.session.commit()
+
+
+def queue_enrollment(user, filenames):
+    """Record uploaded images as pending for the recognition worker to embed.
+
+    ``filenames`` are upload store keys; the same photo uploaded twice is
+    recorded once. Returns the new Image rows straight away; each row's
+    status changes from "pending" once a worker has processed it.
+    """
+    images = [Image(filename=filename, user_id=user.id, status='pending')
+              for filename in dict.fromkeys(filenames)]
+    db.session.add_all(images)
+    db.session.commit()
+    return images
+
+
+def claim_pending_images(limit):
+    """Mark up to ``limit`` pending images as processing; returns their ids.
+
+    Each claim is a conditional UPDATE, as in claim_next_job, so two
+    workers never embed the same image.
+    """
+    table = Image.__table__
+    image_ids = db.session.execute(
+        db.select(table.c.id).where(table.c.status == 'pending')
+        .order_by(table.c.id).limit(limit)).scalars().all()
+    claimed = [image_id for image_id in image_ids if db.session.execute(
+        table.update().where(table.c.id == image_id, table.c.status == 'pending')
+        .values(status='processing')).rowcount]
+    db.session.commit()
+    return claimed
+
+
+def reclaim_stale_images(timeout=None):
+    """Queue again images left processing by a worker that died."""
+    timeout = Config.RECOGNITION_JOB_TIMEOUT if timeout is None else timeout
+    table = Image.__table__
+    reclaimed = db.session.execute(table.update().where(
+        table.c.status == 'processing',
+        or_(table.c.updated_at.is_(None),
+            table.c.updated_at < datetime.now() - timedelta(seconds=timeout))
+    ).values(status='pending')).rowcount
+    db.session.commit()
+    return reclaimed
+
+
+def latest_job(course_id):
+    return RecognitionJob.query.filter_by(course_id=course_id).order_by(
+        RecognitionJob.id.desc()).first()
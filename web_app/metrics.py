@@ -0,0 +1,125 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+from web_app.extensions import db
+
+# Seconds; spans a fast query up to a slow attendance write-back
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+class Histogram:
+    """A Prometheus-style histogram with a fixed set of labels."""
+
+    def __init__(self, name, help, labels, buckets=TIME_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(label, '')) for label in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0, 0.0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += 1
+            series[2] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((key, ([*counts], count, total))
+                            for key, (counts, count, total) in self._series.items())
+        for key, (counts, count, total) in series:
+            labels = ','.join(f'{label}="{_escape(value)}"'
+                              for label, value in zip(self.labels, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = 'le="%g"' % bound
+                lines.append(f'{self.name}_bucket{{{_join(labels, le)}}} {cumulative}')
+            le = 'le="+Inf"'
+            lines.append(f'{self.name}_bucket{{{_join(labels, le)}}} {count}')
+            lines.append(f'{self.name}_sum{{{labels}}} {total:.6f}')
+            lines.append(f'{self.name}_count{{{labels}}} {count}')
+        return lines
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _join(*parts):
+    return ','.join(part for part in parts if part)
+
+
+# Every metric lives in the process that records it: the web app exposes
+# request metrics on /metrics, the recognition worker exposes pipeline
+# metrics on its own status API
+STAGE_SECONDS = Histogram(
+    'attendance_pipeline_stage_seconds',
+    'Time per frame (capture, detect, embed, match) or per session (db_write) '
+    'spent in each recognition stage.',
+    ('stage', 'course', 'classroom'))
+REQUEST_SECONDS = Histogram(
+    'attendance_http_request_seconds',
+    'Time to handle a request, by route.',
+    ('endpoint', 'method', 'status'))
+REQUEST_QUERIES = Histogram(
+    'attendance_http_request_queries',
+    'SQL statements executed while handling a request, by route.',
+    ('endpoint',), QUERY_BUCKETS)
+METRICS = (STAGE_SECONDS, REQUEST_SECONDS, REQUEST_QUERIES)
+
+
+def render_metrics():
+    """All metrics of this process in the Prometheus text format."""
+    return '\n'.join(line for metric in METRICS for line in metric.render()) + '\n'
+
+
+def init_metrics(app):
+    """Time every request and count the SQL statements it runs."""
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_started = time.perf_counter()
+        g.metrics_queries = 0
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            endpoint = request.endpoint or 'unmatched'
+            REQUEST_SECONDS.observe(time.perf_counter() - started,
+                                    endpoint=endpoint, method=request.method,
+                                    status=response.status_code)
+            REQUEST_QUERIES.observe(g.pop('metrics_queries', 0), endpoint=endpoint)
+        return response
+
+    with app.app_context():
+        engine = db.engine
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def count_query(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and 'metrics_queries' in g:
+            g.metrics_queries += 1
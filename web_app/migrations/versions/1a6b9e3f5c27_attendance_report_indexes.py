@@ -0,0 +1,30 @@
+"""attendance report indexes
+
+Revision ID: 1a6b9e3f5c27
+Revises: e7a2c5d8f019
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1a6b9e3f5c27'
+down_revision = 'e7a2c5d8f019'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('attendance', schema=None) as batch_op:
+        batch_op.create_index('ix_attendance_course_student_status',
+                              ['course_id', 'student_id', 'status'], unique=False)
+        batch_op.create_index('ix_attendance_course_date',
+                              ['course_id', 'date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('attendance', schema=None) as batch_op:
+        batch_op.drop_index('ix_attendance_course_date')
+        batch_op.drop_index('ix_attendance_course_student_status')
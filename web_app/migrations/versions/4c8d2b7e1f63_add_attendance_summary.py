@@ -0,0 +1,49 @@
+"""add attendance summary
+
+Revision ID: 4c8d2b7e1f63
+Revises: 1a6b9e3f5c27
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4c8d2b7e1f63'
+down_revision = '1a6b9e3f5c27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('attendance_summary',
+    sa.Column('course_id', sa.Integer(), nullable=False),
+    sa.Column('student_id', sa.Integer(), nullable=False),
+    sa.Column('sessions_held', sa.Integer(), nullable=False),
+    sa.Column('sessions_attended', sa.Integer(), nullable=False),
+    sa.Column('last_attended', sa.Date(), nullable=True),
+    sa.ForeignKeyConstraint(['course_id'], ['course.id'], ),
+    sa.ForeignKeyConstraint(['student_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('course_id', 'student_id')
+    )
+    with op.batch_alter_table('attendance_summary', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_attendance_summary_student_id'), ['student_id'], unique=False)
+
+    # Backfill from the existing attendance history
+    op.execute("""
+        INSERT INTO attendance_summary
+            (course_id, student_id, sessions_held, sessions_attended, last_attended)
+        SELECT course_id, student_id, COUNT(id),
+               SUM(CASE WHEN status = 'Present' THEN 1 ELSE 0 END),
+               MAX(CASE WHEN status = 'Present' THEN date END)
+        FROM attendance
+        GROUP BY course_id, student_id
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('attendance_summary', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_attendance_summary_student_id'))
+
+    op.drop_table('attendance_summary')
@@ -0,0 +1,86 @@
+"""initial schema
+
+Revision ID: 5b1c0e7a9d21
+Revises: 
+Create Date: 2024-12-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b1c0e7a9d21'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _create_table(existing, name, *columns):
+    if name not in existing:
+        op.create_table(name, *columns)
+
+
+def upgrade():
+    # Databases created by db.create_all() before the schema moved to
+    # migrations already have these tables; only missing ones are created
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+    _create_table(existing, 'user',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('enrollment_number', sa.String(length=10), nullable=True),
+    sa.Column('email', sa.String(length=150), nullable=False),
+    sa.Column('password', sa.String(length=60), nullable=False),
+    sa.Column('role', sa.String(length=10), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('email'),
+    sa.UniqueConstraint('enrollment_number')
+    )
+    _create_table(existing, 'classroom',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('location', sa.String(length=100), nullable=True),
+    sa.Column('capacity', sa.Integer(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    _create_table(existing, 'image',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('filename', sa.String(length=255), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    _create_table(existing, 'course',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('professor_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['professor_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    _create_table(existing, 'enrollment',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('course_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['course_id'], ['course.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'course_id')
+    )
+    _create_table(existing, 'attendance',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('status', sa.String(length=10), nullable=False),
+    sa.Column('student_id', sa.Integer(), nullable=False),
+    sa.Column('course_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['course_id'], ['course.id'], ),
+    sa.ForeignKeyConstraint(['student_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('attendance')
+    op.drop_table('enrollment')
+    op.drop_table('course')
+    op.drop_table('image')
+    op.drop_table('classroom')
+    op.drop_table('user')
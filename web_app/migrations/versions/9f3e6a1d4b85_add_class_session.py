@@ -0,0 +1,66 @@
+"""add class session
+
+Revision ID: 9f3e6a1d4b85
+Revises: 4c8d2b7e1f63
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9f3e6a1d4b85'
+down_revision = '4c8d2b7e1f63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('class_session',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('course_id', sa.Integer(), nullable=False),
+    sa.Column('classroom_id', sa.Integer(), nullable=True),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('start_time', sa.DateTime(), nullable=False),
+    sa.Column('end_time', sa.DateTime(), nullable=True),
+    sa.Column('status', sa.String(length=10), nullable=False),
+    sa.ForeignKeyConstraint(['classroom_id'], ['classroom.id'], ),
+    sa.ForeignKeyConstraint(['course_id'], ['course.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('course_id', 'date', name='uq_class_session_course_date')
+    )
+    with op.batch_alter_table('class_session', schema=None) as batch_op:
+        batch_op.create_index('ix_class_session_course_status', ['course_id', 'status'], unique=False)
+
+    with op.batch_alter_table('attendance', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('session_id', sa.Integer(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_attendance_session_id'), ['session_id'], unique=False)
+        batch_op.create_foreign_key('fk_attendance_session_id_class_session',
+                                    'class_session', ['session_id'], ['id'])
+
+    # Every day a course already has attendance for was a class held
+    op.execute("""
+        INSERT INTO class_session (course_id, date, start_time, end_time, status)
+        SELECT course_id, date, date, date, 'closed'
+        FROM attendance
+        GROUP BY course_id, date
+    """)
+    op.execute("""
+        UPDATE attendance SET session_id = (
+            SELECT class_session.id FROM class_session
+            WHERE class_session.course_id = attendance.course_id
+              AND class_session.date = attendance.date)
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('attendance', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_attendance_session_id_class_session', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_attendance_session_id'))
+        batch_op.drop_column('session_id')
+
+    with op.batch_alter_table('class_session', schema=None) as batch_op:
+        batch_op.drop_index('ix_class_session_course_status')
+
+    op.drop_table('class_session')
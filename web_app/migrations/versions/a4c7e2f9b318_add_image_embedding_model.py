@@ -0,0 +1,28 @@
+"""add image embedding model
+
+Revision ID: a4c7e2f9b318
+Revises: f81c3e6a2d94
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4c7e2f9b318'
+down_revision = 'f81c3e6a2d94'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing embeddings have no model recorded, so the gallery ignores
+    # them until `flask reembed-images` recomputes them
+    with op.batch_alter_table('image', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('embedding_model', sa.String(length=100), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('image', schema=None) as batch_op:
+        batch_op.drop_column('embedding_model')
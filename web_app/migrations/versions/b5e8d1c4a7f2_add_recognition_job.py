@@ -0,0 +1,41 @@
+"""add recognition job
+
+Revision ID: b5e8d1c4a7f2
+Revises: 9f3e6a1d4b85
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5e8d1c4a7f2'
+down_revision = '9f3e6a1d4b85'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('recognition_job',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('action', sa.String(length=10), nullable=False),
+    sa.Column('course_id', sa.Integer(), nullable=False),
+    sa.Column('session_id', sa.Integer(), nullable=True),
+    sa.Column('status', sa.String(length=10), nullable=False),
+    sa.Column('error', sa.String(length=255), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['course_id'], ['course.id'], ),
+    sa.ForeignKeyConstraint(['session_id'], ['class_session.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('recognition_job', schema=None) as batch_op:
+        batch_op.create_index('ix_recognition_job_status_id', ['status', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('recognition_job', schema=None) as batch_op:
+        batch_op.drop_index('ix_recognition_job_status_id')
+
+    op.drop_table('recognition_job')
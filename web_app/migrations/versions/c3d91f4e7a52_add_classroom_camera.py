@@ -0,0 +1,26 @@
+"""add classroom camera
+
+Revision ID: c3d91f4e7a52
+Revises: 8e4f2a6c3b10
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3d91f4e7a52'
+down_revision = '8e4f2a6c3b10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('classroom', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('camera', sa.String(length=255), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('classroom', schema=None) as batch_op:
+        batch_op.drop_column('camera')
@@ -0,0 +1,33 @@
+"""add image updated_at
+
+Revision ID: c6f1a9d3e284
+Revises: a4c7e2f9b318
+Create Date: 2026-10-18 21:30:00.000000
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6f1a9d3e284'
+down_revision = 'a4c7e2f9b318'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('image', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_image_updated_at'), ['updated_at'], unique=False)
+    # Local time, like the application writes
+    image = sa.table('image', sa.column('updated_at', sa.DateTime()))
+    op.execute(image.update().values(updated_at=datetime.now()))
+
+
+def downgrade():
+    with op.batch_alter_table('image', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_image_updated_at'))
+        batch_op.drop_column('updated_at')
@@ -0,0 +1,33 @@
+"""add image status
+
+Revision ID: d2a7f4b9c136
+Revises: b5e8d1c4a7f2
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2a7f4b9c136'
+down_revision = 'b5e8d1c4a7f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('image', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('status', sa.String(length=10), nullable=False,
+                                      server_default='pending'))
+
+    # Existing images were embedded synchronously at registration
+    op.execute("""
+        UPDATE image SET status = CASE
+            WHEN embedding IS NULL THEN 'no_face' ELSE 'enrolled' END
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('image', schema=None) as batch_op:
+        batch_op.drop_column('status')
@@ -0,0 +1,26 @@
+"""add recognition job started_at
+
+Revision ID: d9b3f7a2c415
+Revises: c6f1a9d3e284
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9b3f7a2c415'
+down_revision = 'c6f1a9d3e284'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('recognition_job', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('started_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('recognition_job', schema=None) as batch_op:
+        batch_op.drop_column('started_at')
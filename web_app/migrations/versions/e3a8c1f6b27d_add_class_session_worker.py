@@ -0,0 +1,28 @@
+"""add class session worker and heartbeat
+
+Revision ID: e3a8c1f6b27d
+Revises: d9b3f7a2c415
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3a8c1f6b27d'
+down_revision = 'd9b3f7a2c415'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('class_session', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('worker_id', sa.String(length=100), nullable=True))
+        batch_op.add_column(sa.Column('heartbeat_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('class_session', schema=None) as batch_op:
+        batch_op.drop_column('heartbeat_at')
+        batch_op.drop_column('worker_id')
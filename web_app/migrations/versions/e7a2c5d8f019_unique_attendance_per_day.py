@@ -0,0 +1,28 @@
+"""unique attendance per student, course and day
+
+Revision ID: e7a2c5d8f019
+Revises: c3d91f4e7a52
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7a2c5d8f019'
+down_revision = 'c3d91f4e7a52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('attendance', schema=None) as batch_op:
+        batch_op.create_unique_constraint(
+            'uq_attendance_student_course_date', ['student_id', 'course_id', 'date'])
+
+
+def downgrade():
+    with op.batch_alter_table('attendance', schema=None) as batch_op:
+        batch_op.drop_constraint(
+            'uq_attendance_student_course_date', type_='unique')
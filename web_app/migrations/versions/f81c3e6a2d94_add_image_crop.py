@@ -0,0 +1,26 @@
+"""add image crop
+
+Revision ID: f81c3e6a2d94
+Revises: d2a7f4b9c136
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f81c3e6a2d94'
+down_revision = 'd2a7f4b9c136'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('image', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('crop_filename', sa.String(length=255), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('image', schema=None) as batch_op:
+        batch_op.drop_column('crop_filename')
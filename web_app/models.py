@@ -17,9 +17,25 @@ enrollment_table = db.Table(
 
 class Image(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    # Path or name of the file
+    # Path of the file in the upload store, relative to UPLOAD_FOLDER
     filename = db.Column(db.String(255), nullable=False)
+    # Aligned FACE_SIZE face crop saved at ingest (None until processed)
+    crop_filename = db.Column(db.String(255), nullable=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    # float32 face embedding computed once at enrollment (None if no face was found)
+    embedding = db.Column(db.LargeBinary, nullable=True)
+    # Model that computed the embedding; only rows from the configured model
+    # are loaded into the gallery
+    embedding_model = db.Column(db.String(100), nullable=True)
+    # Background enrollment: "pending" or "processing" until the recognition
+    # worker has embedded it, then "enrolled", "no_face", "unreadable" or
+    # "failed"; "withdrawn" once the student has left
+    status = db.Column(db.String(10), nullable=False,
+                       default='pending', server_default='pending')
+    # Last change to the row; recognition workers poll it to keep their
+    # gallery index in step with enrollments made by other processes
+    updated_at = db.Column(db.DateTime, nullable=True, index=True,
+                           default=datetime.now, onupdate=datetime.now)
 
     def __repr__(self):
         return f"Image(User ID: {self.user_id}, Filename: {self.filename})"
@@ -69,11 +85,96 @@ class Attendance(db.Model):
         db.Integer, db.ForeignKey('user.id'), nullable=False)
     course_id = db.Column(db.Integer, db.ForeignKey(
         'course.id'), nullable=False)
+    # Class session the row was recorded in
+    session_id = db.Column(db.Integer, db.ForeignKey(
+        'class_session.id'), nullable=True, index=True)
+
+    # One row per student per course per day, so re-runs update instead of duplicating
+    __table_args__ = (
+        db.UniqueConstraint('student_id', 'course_id', 'date',
+                            name='uq_attendance_student_course_date'),
+        # Covering indexes for the grouped report queries
+        db.Index('ix_attendance_course_student_status',
+                 'course_id', 'student_id', 'status'),
+        db.Index('ix_attendance_course_date', 'course_id', 'date'),
+    )
 
     def __repr__(self):
         return f"Attendance(Student ID: {self.student_id}, Course ID: {self.course_id}, Status: {self.status})"
 
 
+class ClassSession(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    course_id = db.Column(db.Integer, db.ForeignKey(
+        'course.id'), nullable=False)
+    classroom_id = db.Column(db.Integer, db.ForeignKey(
+        'classroom.id'), nullable=True)
+    date = db.Column(db.Date, nullable=False)
+    start_time = db.Column(db.DateTime, nullable=False, default=func.now())
+    end_time = db.Column(db.DateTime, nullable=True)
+    status = db.Column(db.String(10), nullable=False,
+                       default='active')  # "active", "closed" or "failed"
+    # Recognition worker running the class and when it last reported in;
+    # its stop job goes to that worker, and the class only counts as
+    # orphaned once the heartbeat is older than RECOGNITION_WORKER_TIMEOUT
+    worker_id = db.Column(db.String(100), nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+
+    attendance_records = db.relationship(
+        'Attendance', backref='class_session', lazy=True)
+
+    # One session per course per day, matching the attendance uniqueness;
+    # the index makes "classes held" a cheap count
+    __table_args__ = (
+        db.UniqueConstraint('course_id', 'date',
+                            name='uq_class_session_course_date'),
+        db.Index('ix_class_session_course_status', 'course_id', 'status'),
+    )
+
+    def __repr__(self):
+        return f"ClassSession(Course ID: {self.course_id}, Date: {self.date}, Status: {self.status})"
+
+
+class AttendanceSummary(db.Model):
+    # Running totals per student per course, updated as each session's
+    # attendance is committed (rebuild with `flask rebuild-attendance-summary`)
+    course_id = db.Column(db.Integer, db.ForeignKey(
+        'course.id'), primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey(
+        'user.id'), primary_key=True, index=True)
+    sessions_held = db.Column(db.Integer, nullable=False, default=0)
+    sessions_attended = db.Column(db.Integer, nullable=False, default=0)
+    last_attended = db.Column(db.Date, nullable=True)
+
+    def __repr__(self):
+        return f"AttendanceSummary(Student ID: {self.student_id}, Course ID: {self.course_id}, {self.sessions_attended}/{self.sessions_held})"
+
+
+class RecognitionJob(db.Model):
+    # Start/stop commands queued by the web tier for the recognition worker
+    # (`flask recognition-worker`), which claims them oldest first
+    id = db.Column(db.Integer, primary_key=True)
+    action = db.Column(db.String(10), nullable=False)  # "start" or "stop"
+    course_id = db.Column(db.Integer, db.ForeignKey(
+        'course.id'), nullable=False)
+    session_id = db.Column(db.Integer, db.ForeignKey(
+        'class_session.id'), nullable=True)
+    # "queued", "running", "done" or "failed"
+    status = db.Column(db.String(10), nullable=False, default='queued')
+    error = db.Column(db.String(255), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=func.now())
+    # When a worker claimed the job; jobs running for too long are reclaimed
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_recognition_job_status_id', 'status', 'id'),
+    )
+
+    def __repr__(self):
+        return f"RecognitionJob({self.action} Course ID: {self.course_id}, Status: {self.status})"
+
+
 class Classroom(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), unique=True, nullable=False)
@@ -81,6 +182,8 @@ class Classroom(db.Model):
     location = db.Column(db.String(100), nullable=True)
     # Optional: capacity of the classroom
     capacity = db.Column(db.Integer, nullable=True)
+    # Optional: camera device index or stream URL used for recognition
+    camera = db.Column(db.String(255), nullable=True)
 
     def __repr__(self):
         return f"Classroom('{self.name}', Capacity: {self.capacity}, Location: {self.location}')"
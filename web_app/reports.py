@@ -0,0 +1,82 @@
+from sqlalchemy import and_, func
+
+from web_app.extensions import db
+from web_app.models import Attendance, AttendanceSummary, Course, User, enrollment_table
+
+ATTENDANCE_PAGE_SIZE = 50
+
+
+def _percentage(attended, held):
+    return (attended / held) * 100 if held else 0
+
+
+def course_report(course_id):
+    """Attendance per enrolled student of a course, from the summary table.
+
+    Each student is measured against the classes recorded for them, so one
+    who enrolled mid-term is not charged for classes held before joining.
+    """
+    rows = db.session.query(
+        User.id, User.name, User.enrollment_number,
+        func.coalesce(AttendanceSummary.sessions_held, 0).label('held'),
+        func.coalesce(AttendanceSummary.sessions_attended, 0).label('attended')
+    ).join(
+        enrollment_table, enrollment_table.c.user_id == User.id
+    ).outerjoin(
+        AttendanceSummary, and_(AttendanceSummary.student_id == User.id,
+                                AttendanceSummary.course_id == course_id)
+    ).filter(
+        enrollment_table.c.course_id == course_id
+    ).order_by(User.name).all()
+
+    return [{
+        'id': row.id,
+        'name': row.name,
+        'roll_number': row.enrollment_number,
+        'attendance_percentage': round(_percentage(row.attended, row.held), 2)
+    } for row in rows]
+
+
+def student_summary(student_id):
+    """Attendance per course for a student, from the summary table."""
+    rows = db.session.query(
+        Course.id, Course.name,
+        AttendanceSummary.sessions_held, AttendanceSummary.sessions_attended
+    ).join(
+        AttendanceSummary, AttendanceSummary.course_id == Course.id
+    ).filter(
+        AttendanceSummary.student_id == student_id
+    ).order_by(Course.name).all()
+
+    return [{
+        'course': {
+            'id': row.id,
+            'name': row.name
+        },
+        'attended': row.sessions_attended,
+        'missed': row.sessions_held - row.sessions_attended,
+        'percentage': _percentage(row.sessions_attended, row.sessions_held)
+    } for row in rows]
+
+
+def attendance_page(course_id, student_id, before=None, date_from=None,
+                    date_to=None, limit=ATTENDANCE_PAGE_SIZE):
+    """One page of a student's attendance in a course, newest first.
+
+    Pages are keyed on the date (unique per student and course) rather than
+    an offset, so each page is a range scan of the (student_id, course_id,
+    date) unique index. Returns the records and the ``before`` value for the
+    next page, or None on the last page.
+    """
+    query = Attendance.query.filter_by(
+        course_id=course_id, student_id=student_id)
+    if before is not None:
+        query = query.filter(Attendance.date < before)
+    if date_from is not None:
+        query = query.filter(Attendance.date >= date_from)
+    if date_to is not None:
+        query = query.filter(Attendance.date <= date_to)
+
+    records = query.order_by(Attendance.date.desc()).limit(limit + 1).all()
+    next_before = records[limit - 1].date if len(records) > limit else None
+    return records[:limit], next_before
@@ -1,12 +1,20 @@
-from flask import render_template, redirect, url_for, flash, request, Blueprint
+from flask import render_template, redirect, url_for, flash, request, Blueprint, jsonify, Response, stream_with_context, current_app, make_response, session
 from flask_login import login_user, current_user, logout_user, login_required
 from web_app.extensions import db, bcrypt  # Import from extensions
 from web_app.forms import RegistrationForm, LoginForm
-from web_app.models import User, Attendance, Course, Classroom
-import os
+from web_app.models import User, Course, Classroom, AttendanceSummary, Image
 from web_app.config import Config
-from werkzeug.utils import secure_filename
-from web_app.faceDetection.mtcnn_webcam import start_face_detection, stop_face_detection
+from web_app.jobs import enqueue_job, latest_job, queue_enrollment
+from web_app.storage import save_upload
+from web_app.reports import course_report, student_summary, attendance_page
+from web_app.attendance import open_class_session
+from web_app.exports import attendance_rows, stream_csv, stream_ndjson
+from web_app.metrics import render_metrics
+from web_app.cache import cached, dashboard_key, report_key
+from datetime import datetime
+import json
+from urllib.error import URLError
+from urllib.request import urlopen
 
 
 # Blueprint for routes
@@ -14,6 +22,19 @@ app_routes = Blueprint('app_routes', __name__)
 
 # Define routes here...
 
+def attendance_page_args():
+    # Keyset cursor and date-range filters shared by the attendance detail views
+    return {key: parse_date(request.args.get(key))
+            for key in ('before', 'date_from', 'date_to')}
+
+
+def attendance_page_json(records, next_before):
+    return jsonify({
+        'records': [{'date': r.date.isoformat(), 'status': r.status} for r in records],
+        'next_before': next_before.isoformat() if next_before else None
+    })
+
+
 # Homepage
 
 
@@ -30,29 +51,25 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def parse_date(value):
+    # Dates come from <input type="date"> fields as YYYY-MM-DD
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+
 # Registration route where file upload is handled
 
 
 @app_routes.route('/register', methods=['GET', 'POST'])
 def register():
-    print("Registration route hit")  # Debugging: Route hit
-
     if current_user.is_authenticated:
-        print(
-            f"User {current_user.name} is already authenticated with role {current_user.role}")
         return redirect(url_for('app_routes.student_dashboard' if current_user.role == 'student' else 'app_routes.professor_dashboard'))
 
     form = RegistrationForm()
-    print("Form instantiated")  # Debugging: Form instantiated
 
     if form.validate_on_submit():
-        print("Form validated successfully")  # Debugging: Form validated
-
         # Check for existing user
         existing_user = User.query.filter_by(email=form.email.data).first()
         if existing_user:
-            # Debugging: Existing email
-            print(f"User with email {form.email.data} already exists")
             flash(
                 'Email already registered. Please choose a different one or log in.', 'danger')
             return redirect(url_for('app_routes.register'))
@@ -60,8 +77,6 @@ def register():
         # Hash the password for secure storage
         hashed_password = bcrypt.generate_password_hash(
             form.password.data).decode('utf-8')
-        # Debugging: Password hashed
-        print(f"Password hashed for user {form.name.data}")
 
         # If the user is a student, enrollment_number is required
         if form.role.data == 'student':
@@ -80,78 +95,63 @@ def register():
         )
         db.session.add(user)
         db.session.commit()
-        # Debugging: User added to DB
-        print(
-            f"User {form.name.data} with role {form.role.data} added to the database")
+        current_app.logger.info('Registered %s user %s', user.role, user.id)
 
         # If the user is a student, handle image uploads
         if form.role.data == 'student' and 'images' in request.files:
             images = request.files.getlist('images')
-            # Debugging: Images received
-            print(f"Student role selected, {len(images)} images received")
 
             if len(images) < 5:
-                # Debugging: Not enough images
-                print("Fewer than 5 images uploaded for student")
                 flash('Please upload at least 5 images for face recognition.', 'danger')
                 return redirect(url_for('app_routes.register'))
 
+            saved_filenames = []
             for image in images:
                 if image.filename == '':
-                    print("No image selected")  # Debugging: No image selected
                     flash('No image selected', 'danger')
                     return redirect(url_for('app_routes.register'))
 
                 if not allowed_file(image.filename):
-                    # Debugging: Invalid file type
-                    print(f"Invalid file type: {image.filename}")
                     flash(
                         'Only image files (png, jpg, jpeg, gif) are allowed.', 'danger')
                     return redirect(url_for('app_routes.register'))
 
-                # Secure the filename and save the image to the uploads folder
-                filename = secure_filename(image.filename)
-                image.save(os.path.join(Config.UPLOAD_FOLDER, filename))
-                # Debugging: Image saved
-                print(f"Image {filename} saved for student")
+                # Store the image under its content hash; identical uploads
+                # share one file, and names never collide
+                filename = save_upload(image, Config.UPLOAD_FOLDER)
+                saved_filenames.append(filename)
+
+            # The recognition worker finds and embeds the faces; each Image
+            # row reports its status (see /enrollment_status)
+            queue_enrollment(user, saved_filenames)
 
-            flash('Registration successful! Images uploaded.', 'success')
+            flash('Registration successful! Your images are being processed.', 'success')
 
         # For professors, handle the single image upload
         elif form.role.data == 'professor' and 'images' in request.files:
             images = request.files.getlist('images')
-            # Debugging: Image received
-            print(f"Professor role selected, {len(images)} image(s) received")
 
             if len(images) != 1:
-                # Debugging: Wrong number of images
-                print("Incorrect number of images uploaded for professor")
                 flash('Professors must upload exactly 1 image.', 'danger')
                 return redirect(url_for('app_routes.register'))
 
             image = images[0]  # Since professor uploads only one image
             if not allowed_file(image.filename):
-                # Debugging: Invalid file type
-                print(f"Invalid file type: {image.filename}")
                 flash('Only image files (png, jpg, jpeg, gif) are allowed.', 'danger')
                 return redirect(url_for('app_routes.register'))
 
-            filename = secure_filename(image.filename)
-            image.save(os.path.join(Config.UPLOAD_FOLDER, filename))
-            # Debugging: Image saved
-            print(f"Image {filename} saved for professor")
+            filename = save_upload(image, Config.UPLOAD_FOLDER)
+            queue_enrollment(user, [filename])
 
             flash('Registration successful! Image uploaded.', 'success')
 
         else:
-            # Debugging: No images uploaded
-            print("No images uploaded, proceeding without image upload")
             flash('Registration successful!', 'success')
 
         return redirect(url_for('app_routes.login'))
 
-    print("Form did not validate")  # Debugging: Form validation failed
-    print(form.errors)  # Debugging: Form errors
+    if form.errors:
+        current_app.logger.debug('Registration form errors: %s', form.errors)
     return render_template('register.html', form=form)
 
 
@@ -195,36 +195,20 @@ def student_dashboard():
         flash('Access denied', 'danger')
         return redirect(url_for('app_routes.home'))
 
-    # Fetch all courses the student has ever attended
-    courses = db.session.query(Course).join(Attendance).filter(
-        Attendance.student_id == current_user.id).all()
-
-    attendance_summary = []
-    for course in courses:
-        total_classes = db.session.query(Attendance).filter_by(
-            course_id=course.id).count()
-
-        attended_classes = db.session.query(Attendance).filter_by(
-            course_id=course.id, student_id=current_user.id, status='Present').count()
-
-        missed_classes = total_classes - attended_classes  # Calculate missed classes
-
-        if total_classes > 0:
-            attendance_percentage = (attended_classes / total_classes) * 100
-        else:
-            attendance_percentage = 0
-
-        attendance_summary.append({
-            'course': {
-                'id': course.id,
-                'name': course.name
-            },
-            'attended': attended_classes,
-            'missed': missed_classes,
-            'percentage': attendance_percentage
-        })
-
-    return render_template('student_dashboard.html', attendance_summary=attendance_summary)
+    # Per-course totals for every course the student has attendance in,
+    # cached until the student's attendance changes
+    attendance_summary, etag = cached(
+        dashboard_key(current_user.id), lambda: student_summary(current_user.id))
+
+    # A flashed message makes the page differ from the cached one
+    conditional = '_flashes' not in session
+    response = make_response(render_template(
+        'student_dashboard.html', attendance_summary=attendance_summary))
+    if conditional:
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.make_conditional(request)
+    return response
 
 # Route for viewing detailed attendance of a particular course
 
@@ -238,11 +222,21 @@ def view_attendance(course_id):
 
     course = Course.query.get_or_404(course_id)
 
-    # Fetch attendance records for this course for the current user
-    attendance_records = Attendance.query.filter_by(
-        course_id=course_id, student_id=current_user.id).all()
+    try:
+        page_args = attendance_page_args()
+    except ValueError:
+        flash('Invalid date.', 'danger')
+        return redirect(url_for('app_routes.view_attendance', course_id=course_id))
 
-    return render_template('course_attendance.html', course=course, attendance_records=attendance_records)
+    # Fetch one page of attendance records for this course for the current user
+    attendance_records, next_before = attendance_page(
+        course_id, current_user.id, **page_args)
+
+    if request.args.get('format') == 'json':
+        return attendance_page_json(attendance_records, next_before)
+
+    return render_template('course_attendance.html', course=course, attendance_records=attendance_records,
+                           next_before=next_before, **page_args)
 
 
 # Professor Dashboard
@@ -280,9 +274,20 @@ def schedule_class():
         flash('All fields are required to schedule a class.', 'danger')
         return redirect(url_for('app_routes.professor_dashboard'))
 
+    try:
+        class_date = parse_date(date)
+    except ValueError:
+        flash('Invalid date.', 'danger')
+        return redirect(url_for('app_routes.professor_dashboard'))
+
     if course_id:
         # Trigger the face detection for the selected course
-        start_face_detection(int(course_id))
+        classroom = Classroom.query.get(classroom_id)
+        # Record the class itself; end_attendance closes it
+        class_session = open_class_session(
+            int(course_id), class_date, classroom.id if classroom else None)
+        # The recognition worker picks the session up from the job queue
+        enqueue_job('start', int(course_id), class_session.id)
 
         # Flash a success message
         flash(
@@ -312,8 +317,11 @@ def view_class_details(course_id, date):
         flash('Course not found', 'danger')
         return redirect(url_for('app_routes.professor_dashboard'))
 
+    # Latest start/stop job, so a session the worker could not start shows up
+    job = latest_job(course_id)
+
     # Pass course and other relevant details to the template
-    return render_template('class_details.html', course=course, date=date, classroom=classroom)
+    return render_template('class_details.html', course=course, date=date, classroom=classroom, job=job)
 
 
 # Route to end Attendance (Professor only)
@@ -326,14 +334,50 @@ def end_attendance(course_id):
         flash('Access denied', 'danger')
         return redirect(url_for('app_routes.home'))
 
-    # Stop the face detection process and update attendance
-    # Pass course_id to stop and update attendance
-    stop_face_detection(course_id)
+    # The recognition worker stops the session and writes its attendance
+    enqueue_job('stop', course_id)
 
-    flash(f'Attendance ended for course {course_id}', 'success')
+    flash(f'Ending attendance for course {course_id}; it is recorded once the '
+          'recognition worker stops the session.', 'info')
     return redirect(url_for('app_routes.professor_dashboard'))
 
 
+# Prometheus scrape endpoint for request metrics (recognition pipeline
+# metrics are served by the recognition worker's own /metrics)
+@app_routes.route('/metrics', methods=['GET'])
+def metrics():
+    if Config.METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {Config.METRICS_TOKEN}':
+        return Response('Unauthorized\n', status=401, mimetype='text/plain')
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+
+# Route reporting the background processing of the user's uploaded images
+@app_routes.route('/enrollment_status', methods=['GET'])
+@login_required
+def enrollment_status():
+    images = Image.query.filter_by(user_id=current_user.id).order_by(Image.id).all()
+    return jsonify({
+        'images': [{'id': image.id, 'filename': image.filename, 'status': image.status}
+                   for image in images],
+        'pending': sum(image.status in ('pending', 'processing') for image in images)
+    })
+
+
+# Route listing the running recognition sessions (Professor only)
+@app_routes.route('/sessions/status', methods=['GET'])
+@login_required
+def sessions_status():
+    if current_user.role != 'professor':
+        return jsonify({'error': 'Access denied'}), 403
+
+    # Sessions run in the recognition worker; ask its status API
+    try:
+        with urlopen(Config.RECOGNITION_WORKER_URL + '/status', timeout=2) as response:
+            return jsonify(json.load(response))
+    except (URLError, OSError, ValueError):
+        return jsonify({'error': 'Recognition worker is not reachable'}), 503
+
+
 # Route to view attendance report (Professor only)
 @app_routes.route('/view_report', methods=['POST'])
 @login_required
@@ -342,37 +386,61 @@ def view_report():
         flash('Access denied', 'danger')
         return redirect(url_for('app_routes.home'))
 
-    course_id = request.form.get('course')
+    course_id = request.form.get('course', type=int)
 
-    course = Course.query.get(course_id)
-    if not course:
+    def build_report():
+        course = Course.query.get(course_id)
+        if not course:
+            return None
+        # One grouped query over the course roster
+        return {'course_name': course.name, 'report_data': course_report(course.id)}
+
+    # Cached until the course's attendance changes
+    report, _ = cached(report_key(course_id), build_report) if course_id else (None, None)
+    if report is None:
         flash('Course not found.', 'danger')
         return redirect(url_for('app_routes.home'))
 
-    students = User.query.filter_by(role='student').all()
+    return render_template('attendance_report.html',
+                           report_data=report['report_data'],
+                           course_name=report['course_name'],
+                           course_id=course_id)
 
-    report_data = []
-    for student in students:
-        total_classes = Attendance.query.filter_by(
-            course_id=course_id, student_id=student.id).count()
 
-        classes_attended = Attendance.query.filter_by(
-            course_id=course_id, student_id=student.id, status='Present').count()
+# Route to export attendance as streamed CSV or NDJSON (Professor only)
+@app_routes.route('/export_attendance', methods=['GET'])
+@login_required
+def export_attendance():
+    if current_user.role != 'professor':
+        flash('Access denied', 'danger')
+        return redirect(url_for('app_routes.home'))
 
-        attendance_percentage = (
-            classes_attended / total_classes) * 100 if total_classes > 0 else 0
+    # Professors export their own courses, optionally narrowed to one
+    course_ids = [c.id for c in Course.query.filter_by(
+        professor_id=current_user.id)]
+    course_id = request.args.get('course', type=int)
+    if course_id is not None:
+        if course_id not in course_ids:
+            flash('Course not found.', 'danger')
+            return redirect(url_for('app_routes.professor_dashboard'))
+        course_ids = [course_id]
+
+    try:
+        date_from = parse_date(request.args.get('date_from'))
+        date_to = parse_date(request.args.get('date_to'))
+    except ValueError:
+        flash('Invalid date.', 'danger')
+        return redirect(url_for('app_routes.professor_dashboard'))
 
-        report_data.append({
-            'id': student.id,
-            'name': student.name,
-            'roll_number': student.enrollment_number,
-            'attendance_percentage': round(attendance_percentage, 2)
-        })
+    rows = attendance_rows(course_ids, date_from, date_to)
+    if request.args.get('format') == 'ndjson':
+        body, mimetype, extension = stream_ndjson(rows), 'application/x-ndjson', 'ndjson'
+    else:
+        body, mimetype, extension = stream_csv(rows), 'text/csv', 'csv'
 
-    return render_template('attendance_report.html',
-                           report_data=report_data,
-                           course_name=course.name,
-                           course_id=course_id)
+    # Rows are fetched and sent in batches, so memory stays flat
+    return Response(stream_with_context(body), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename=attendance.{extension}'})
 
 
 # Route to view detailed attendance for a specific student in a course (Professor only)
@@ -395,11 +463,28 @@ def view_student_attendance(course_id, student_id):
         flash('Course not found.', 'danger')
         return redirect(url_for('app_routes.home'))
 
-    # Fetch attendance records for the student in the course
-    attendance_records = Attendance.query.filter_by(
-        course_id=course_id, student_id=student_id).all()
+    try:
+        page_args = attendance_page_args()
+    except ValueError:
+        flash('Invalid date.', 'danger')
+        return redirect(url_for('app_routes.view_student_attendance',
+                                course_id=course_id, student_id=student_id))
+
+    # Fetch one page of attendance records for the student in the course
+    attendance_records, next_before = attendance_page(
+        course_id, student_id, **page_args)
+
+    if request.args.get('format') == 'json':
+        return attendance_page_json(attendance_records, next_before)
+
+    # Totals come from the summary table rather than counting the records
+    summary = AttendanceSummary.query.get((course_id, student_id))
 
     return render_template('student_attendance_details.html',
                            attendance_records=attendance_records,
+                           summary=summary,
                            student=student,
-                           course_name=course.name)
+                           course_id=course_id,
+                           course_name=course.name,
+                           next_before=next_before,
+                           **page_args)
@@ -0,0 +1,46 @@
+import hashlib
+import os
+import tempfile
+
+CHUNK_SIZE = 64 * 1024
+
+
+def content_key(digest, extension):
+    # Two levels of 256 shards keep every directory small
+    return f'{digest[:2]}/{digest[2:4]}/{digest}.{extension}'
+
+
+def crop_key(key):
+    """Store key of the face crop derived from an upload."""
+    return key.rsplit('.', 1)[0] + '.face.jpg'
+
+
+def save_upload(file, folder):
+    """Store an uploaded file under the SHA-256 of its contents.
+
+    The file is streamed to a temporary name while it is hashed, then moved
+    into its shard, so identical uploads share one file and a half-written
+    upload is never visible. Returns the key, a path relative to ``folder``.
+    """
+    extension = file.filename.rsplit('.', 1)[1].lower()
+    os.makedirs(folder, exist_ok=True)
+    digest = hashlib.sha256()
+    fd, temp_path = tempfile.mkstemp(dir=folder, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            for chunk in iter(lambda: file.stream.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+                out.write(chunk)
+
+        key = content_key(digest.hexdigest(), extension)
+        path = os.path.join(folder, key)
+        if os.path.exists(path):
+            os.remove(temp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return key